@@ -1,8 +1,11 @@
 # ai_config.py
 from io import BytesIO
+import re
 from langchain_openai import ChatOpenAI
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
+from audio_cache import audio_cache
+from request_scheduler import scheduler, SchedulingTransport, AsyncSchedulingTransport
 import os
 
 # Load environment variables from .env file
@@ -13,51 +16,137 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 
 # Model configuration
 model = "gpt-4o-mini"
+tts_model = "tts-1-hd"
+
+# HTTP clients sending every provider request through the shared scheduler, which limits
+# concurrency and request rates and retries 429/5xx responses (client-side retries are off).
+# The async transport keeps a connection pool per event loop, so the synchronous wrappers that
+# run each call in a fresh loop (settings.respond, generate_interview_report) can share these clients.
+http_client = DefaultHttpxClient(transport=SchedulingTransport(scheduler))
+async_http_client = DefaultAsyncHttpxClient(transport=AsyncSchedulingTransport(scheduler))
 
 # Load the OpenAI model for text generation
 def load_model(openai_api_key):
     return ChatOpenAI(
         model_name=model,
         openai_api_key=openai_api_key,
-        temperature=0.5
+        temperature=0.5,
+        max_retries=0,
+        http_client=http_client,
+        http_async_client=async_http_client
     )
 
-# Initialize the OpenAI client for speech and transcription
-client = OpenAI(api_key=openai_api_key)
+# Initialize the OpenAI clients for speech and transcription
+client = OpenAI(api_key=openai_api_key, max_retries=0, http_client=http_client)
+async_client = AsyncOpenAI(api_key=openai_api_key, max_retries=0, http_client=async_http_client)
+
+def _write_audio(chunks, output):
+    if isinstance(output, BytesIO):
+        # Write to BytesIO buffer
+        for chunk in chunks:
+            output.write(chunk)
+    else:
+        # Write to file path
+        with open(output, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
 
 # Convert text to speech
-def convert_text_to_speech(text, output, voice="alloy"):
+def convert_text_to_speech(text, output, voice="alloy", cacheable=False):
     """
     Convert text to speech using OpenAI's TTS API.
     Args:
         text (str): The text to convert to speech.
         output: Either a file path (str) or BytesIO object to write the audio to.
         voice (str): The voice to use (e.g., 'alloy', 'onyx').
+        cacheable (bool): Look up and store the audio in the audio cache (fixed strings only).
     """
+    if cacheable:
+        audio = audio_cache.get(text, voice, tts_model)
+        if audio is not None:
+            _write_audio([audio], output)
+            return
     try:
-        response = client.audio.speech.create(model="tts-1-hd", voice=voice, input=text)
-        
-        if isinstance(output, BytesIO):
-            # Write to BytesIO buffer
-            for chunk in response.iter_bytes():
-                output.write(chunk)
-        else:
-            # Write to file path
-            with open(output, 'wb') as f:
-                for chunk in response.iter_bytes():
-                    f.write(chunk)
+        response = client.audio.speech.create(model=tts_model, voice=voice, input=text)
+        audio = response.content
+        if cacheable:
+            audio_cache.put(text, voice, tts_model, audio)
+        _write_audio([audio], output)
+    except Exception as e:
+        print(f"Error in text-to-speech conversion: {e}")
+        # Fallback to a default message
+        fallback_text = "An error occurred while generating audio."
+        response = client.audio.speech.create(model=tts_model, voice=voice, input=fallback_text)
+        _write_audio(response.iter_bytes(), output)
+
+async def aconvert_text_to_speech(text, output, voice="alloy", cacheable=False):
+    """Async version of convert_text_to_speech using the async OpenAI client."""
+    if cacheable:
+        audio = audio_cache.get(text, voice, tts_model)
+        if audio is not None:
+            _write_audio([audio], output)
+            return
+    try:
+        response = await async_client.audio.speech.create(model=tts_model, voice=voice, input=text)
+        if cacheable:
+            audio_cache.put(text, voice, tts_model, response.content)
+        _write_audio([response.content], output)
     except Exception as e:
         print(f"Error in text-to-speech conversion: {e}")
         # Fallback to a default message
         fallback_text = "An error occurred while generating audio."
-        response = client.audio.speech.create(model="tts-1-hd", voice=voice, input=fallback_text)
-        if isinstance(output, BytesIO):
-            for chunk in response.iter_bytes():
-                output.write(chunk)
+        response = await async_client.audio.speech.create(model=tts_model, voice=voice, input=fallback_text)
+        _write_audio([response.content], output)
+
+def split_sentences(text, max_chars=300):
+    """
+    Split text into sentence groups of at most max_chars characters (single long
+    sentences are kept whole), so speech for the first group can play while the
+    rest is synthesized.
+    """
+    sentences = [sentence for sentence in re.split(r'(?<=[.!?।？。])\s+', text.strip()) if sentence]
+    groups = []
+    for sentence in sentences:
+        if groups and len(groups[-1]) + len(sentence) + 1 <= max_chars:
+            groups[-1] = f"{groups[-1]} {sentence}"
         else:
-            with open(output, 'wb') as f:
-                for chunk in response.iter_bytes():
-                    f.write(chunk)
+            groups.append(sentence)
+    return groups
+
+async def astream_text_to_speech(text, voice="alloy", cacheable=False):
+    """
+    Stream speech for text as MP3 chunks while it is being synthesized.
+
+    Long text is split into sentence groups that are synthesized one after another;
+    the MP3 streams are concatenated, which browsers play back seamlessly.
+    Args:
+        text (str): The text to convert to speech.
+        voice (str): The voice to use (e.g., 'alloy', 'onyx').
+        cacheable (bool): Look up and store the audio in the audio cache (fixed strings only).
+    """
+    if cacheable:
+        audio = audio_cache.get(text, voice, tts_model)
+        if audio is not None:
+            yield audio
+            return
+    chunks = []
+    try:
+        for sentence in split_sentences(text):
+            async with async_client.audio.speech.with_streaming_response.create(
+                    model=tts_model, voice=voice, input=sentence, response_format="mp3") as response:
+                async for chunk in response.iter_bytes():
+                    chunks.append(chunk)
+                    yield chunk
+    except Exception as e:
+        print(f"Error in text-to-speech conversion: {e}")
+        if not chunks:
+            # Fallback to a default message
+            response = await async_client.audio.speech.create(
+                model=tts_model, voice=voice, input="An error occurred while generating audio.")
+            yield response.content
+        return
+    if cacheable:
+        audio_cache.put(text, voice, tts_model, b"".join(chunks))
 
 # Transcribe audio to text
 def transcribe_audio(audio):
@@ -78,3 +167,17 @@ def transcribe_audio(audio):
     except Exception as e:
         print(f"Error in audio transcription: {e}")
         return "Error transcribing audio."
+
+
+async def atranscribe_audio(audio):
+    """Async version of transcribe_audio using the async OpenAI client."""
+    try:
+        with open(audio, "rb") as audio_file:
+            transcription = await async_client.audio.transcriptions.create(
+                model="whisper-1",
+                file=audio_file
+            )
+        return transcription.text
+    except Exception as e:
+        print(f"Error in audio transcription: {e}")
+        return "Error transcribing audio."
@@ -1,70 +1,55 @@
+import asyncio
 import gradio as gr
-import tempfile
+import threading
 import os
-from pathlib import Path
-from io import BytesIO
 from settings import (
-    respond,
+    astream_respond,
+    astream_session_speech,
     generate_random_string,
-    reset_interview,
-    generate_interview_report,
+    astream_interview_report,
+    uses_native_language,
+    start_prefetch,
+    get_initial_message,
+    warm_translation_cache,
+    prerender_fixed_audio,
+    SUPPORTED_LANGUAGES,
+    CONCLUSION_MESSAGE,
+    END_MESSAGE,
     generate_report_from_file,
-    interview_history,
-    question_count,
-    language,
-    total_questions,
-    translate_text  # Import the new translate_text function
+    atranslate_text
 )
-from ai_config import convert_text_to_speech, transcribe_audio
-from prompt_instructions import get_interview_initial_message_sarah, get_interview_initial_message_aaron
-
-# Global variables
-temp_audio_files = []
-initial_audio_path = None
-selected_interviewer = "Sarah"
-audio_enabled = False  # Audio output disabled by default
-selected_language = "English"  # Default language
-
-def reset_interview_action(voice, total_questions_value, language_choice):
-    global question_count, interview_history, selected_interviewer, selected_language
-    selected_interviewer = voice
-    selected_language = language_choice  # Set language from dropdown
-    question_count = 0
-    interview_history.clear()
-
-    if voice == "Sarah":
-        initial_message_english = get_interview_initial_message_sarah(selected_language, total_questions_value)
-        voice_setting = "alloy"
-    else:
-        initial_message_english = get_interview_initial_message_aaron(selected_language, total_questions_value)
-        voice_setting = "onyx"
+from session import sessions
+from ai_config import atranscribe_audio
+from request_scheduler import set_request_session
+
+def get_session(request: gr.Request):
+    """Return the interview session of the browser tab that sent the request."""
+    # Provider requests made while handling this event queue fairly under the session
+    set_request_session(request.session_hash)
+    return sessions.get(request.session_hash)
+
+async def collect_speech(session, text, cacheable=False):
+    """Synthesize text with the session's voice and return the MP3 bytes."""
+    return b"".join([chunk async for chunk in astream_session_speech(session, text, cacheable)])
+
+async def reset_interview_action(session, voice, total_questions_value, language_choice):
+    session.reset(voice, total_questions_value, language_choice)  # Set settings from dropdowns
+    selected_language = session.language
+
+    initial_message_english = get_initial_message(voice, selected_language, total_questions_value)
 
     # Translate initial message to selected language
-    initial_message = translate_text(initial_message_english, selected_language, "english")
-
-    # Only generate audio if audio_enabled is True
-    audio_output = None
-    if audio_enabled:
-        initial_audio_buffer = BytesIO()
-        convert_text_to_speech(initial_message, initial_audio_buffer, voice_setting)
-        initial_audio_buffer.seek(0)
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-            temp_audio_path = temp_file.name
-            temp_file.write(initial_audio_buffer.getvalue())
-        temp_audio_files.append(temp_audio_path)
-        audio_output = gr.Audio(value=temp_audio_path, label=voice, autoplay=True, visible=False)
-    else:
-        audio_output = gr.Audio(value=None, label=voice, visible=False)
-
-    return (
-        [{"role": "assistant", "content": initial_message}],
-        audio_output,
-        ""  # Reset textbox value, keeping it editable
-    )
+    initial_message = await atranslate_text(initial_message_english, selected_language, "english", cacheable=True)
+    chatbot = [{"role": "assistant", "content": initial_message}]
+    start_prefetch(session)  # Warm the first question while the patient reads the greeting
+    yield chatbot, None, ""  # Reset textbox value, keeping it editable
 
-def create_app():
-    global initial_audio_path, selected_interviewer, audio_enabled, selected_language
+    # Stream the greeting audio only if audio is enabled for the session
+    if session.audio_enabled:
+        async for chunk in astream_session_speech(session, initial_message, cacheable=True):
+            yield chatbot, chunk, ""
 
+def create_app():
     with gr.Blocks(title="AI Medical Interviewer") as demo:
         gr.Markdown(
             """
@@ -86,7 +71,7 @@ def create_app():
                         value="Sarah"
                     )
                     language_dropdown = gr.Dropdown(
-                        choices=["English", "Spanish", "French", "German", "Italian", "Hindi"],  # Added Hindi
+                        choices=SUPPORTED_LANGUAGES,
                         label="Language",
                         value="English"
                     )
@@ -101,6 +86,7 @@ def create_app():
                     label="Sarah",
                     scale=3,
                     autoplay=True,
+                    streaming=True,  # Playback starts while speech is still being synthesized
                     visible=False,
                     show_download_button=False,
                 )
@@ -117,76 +103,86 @@ def create_app():
             send_button = gr.Button("Send")
             pdf_output = gr.File(label="Download Report", visible=False)
 
-            def user(user_message, audio, history):
+            async def user(user_message, audio, history, request: gr.Request):
+                session = get_session(request)
                 if audio is not None:
-                    user_message = transcribe_audio(audio)  # Transcribe audio in selected language
+                    user_message = await atranscribe_audio(audio)  # Transcribe audio in selected language
+                if uses_native_language(session):
+                    # The interview chain reads the answer in the patient's own language
+                    return "", None, history + [{"role": "user", "content": user_message or ""}]
                 # Translate user input from selected language to English
-                translated_message = translate_text(user_message, "English", selected_language) if user_message else ""
+                translated_message = await atranslate_text(user_message, "English", session.language) if user_message else ""
                 return "", None, history + [{"role": "user", "content": translated_message}]
 
-            def bot_response(chatbot, message):
-                global question_count, temp_audio_files, selected_interviewer, audio_enabled, selected_language
-                question_count += 1
+            async def bot_response(chatbot, message, request: gr.Request):
+                session = get_session(request)
 
                 last_user_message = chatbot[-1]["content"] if chatbot and chatbot[-1]["role"] == "user" else message
 
-                voice = "alloy" if selected_interviewer == "Sarah" else "onyx"
-                # Pass selected_language to respond for translation
-                response, audio_path = respond(chatbot, last_user_message, voice, selected_interviewer, audio_enabled, selected_language)
-
-                # Response is already translated in respond function
-                for bot_message in response:
-                    chatbot.append({"role": "assistant", "content": bot_message[1]})
-
-                # Process audio only if audio_enabled is True and an audio_path is returned
-                if audio_enabled and audio_path:
-                    with open(audio_path, 'rb') as audio_file:
-                        audio_buffer = BytesIO(audio_file.read())
-                    temp_audio_path = audio_path
-                    audio_output = gr.Audio(value=temp_audio_path, label=selected_interviewer, autoplay=True, visible=False)
-                else:
-                    audio_output = gr.Audio(value=None, label=selected_interviewer, visible=False)
-
-                if question_count >= total_questions:
-                    conclusion_message_english = "Thank you for participating in this interview. We have reached the end of our session. I hope this conversation has been helpful. Take care!"
-                    conclusion_message = translate_text(conclusion_message_english, selected_language, "english")
-                    chatbot.append({"role": "assistant", "content": conclusion_message})
-
-                    if audio_enabled:
-                        conclusion_audio_buffer = BytesIO()
-                        convert_text_to_speech(conclusion_message, conclusion_audio_buffer, voice)
-                        conclusion_audio_buffer.seek(0)
-                        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-                            temp_audio_path = temp_file.name
-                            temp_file.write(conclusion_audio_buffer.getvalue())
-                        temp_audio_files.append(temp_audio_path)
-                        audio_output = gr.Audio(value=temp_audio_path, label=selected_interviewer, autoplay=True, visible=False)
-
-                    report_content, pdf_path = generate_interview_report(interview_history, selected_language)
-                    chatbot.append({"role": "assistant", "content": f"Interview Report:\n\n{report_content}"})
-
-                    return chatbot, audio_output, gr.File(visible=True, value=pdf_path), ""
-
-                return chatbot, audio_output, gr.File(visible=False), ""
-
-            def start_interview(interviewer, questions, language):
-                global total_questions
-                total_questions = int(questions)  # Update the global total_questions from dropdown
-                return reset_interview_action(interviewer, total_questions, language)
-
-            def end_interview(chatbot):
-                end_message_english = "The interview has been ended by the user."
-                end_message = translate_text(end_message_english, selected_language, "english")
+                # Stream the question into a new assistant message as it is generated
+                chatbot.append({"role": "assistant", "content": ""})
+                speech_stream = None
+                async for question, speech_stream in astream_respond(session, chatbot, last_user_message):
+                    chatbot[-1]["content"] = question
+                    yield chatbot, None, gr.update(), ""
+
+                # Stream the question audio chunk by chunk if audio is enabled
+                if session.audio_enabled and speech_stream is not None:
+                    async for chunk in speech_stream:
+                        yield chatbot, chunk, gr.update(), ""
+
+                if session.question_count >= session.total_questions:
+                    async def conclude():
+                        conclusion_message = await atranslate_text(CONCLUSION_MESSAGE, session.language, "english", cacheable=True)
+                        if session.audio_enabled:
+                            # Held by the session until played, so it is dropped if the session ends first
+                            session.audio.put("conclusion", await collect_speech(session, conclusion_message, cacheable=True))
+                        return conclusion_message
+
+                    # The closing message and the report are independent, so the closing message is
+                    # prepared in the background while the report streams in
+                    conclusion_task = asyncio.create_task(conclude())
+                    conclusion_entry = {"role": "assistant", "content": "…"}
+                    report_entry = {"role": "assistant", "content": "Interview Report:\n\n"}
+                    chatbot.extend([conclusion_entry, report_entry])
+
+                    def fill_conclusion():
+                        conclusion_entry["content"] = conclusion_task.result()
+                        return session.audio.take("conclusion")
+
+                    pdf_path = None
+                    await session.wait_for_translations()  # The report reads the English copies of the answers
+                    async for report_content, pdf_path in astream_interview_report(session.interview_history, session.language):
+                        report_entry["content"] = f"Interview Report:\n\n{report_content}"
+                        conclusion_audio = None
+                        if conclusion_task.done() and conclusion_entry["content"] == "…":
+                            conclusion_audio = fill_conclusion()
+                        yield chatbot, conclusion_audio, gr.update(), ""
+
+                    await conclusion_task
+                    conclusion_audio = fill_conclusion() if conclusion_entry["content"] == "…" else None
+                    yield chatbot, conclusion_audio, gr.File(visible=True, value=pdf_path), ""
+                    return
+
+                yield chatbot, None, gr.File(visible=False), ""
+
+            async def start_interview(interviewer, questions, language, request: gr.Request):
+                total_questions = int(questions)  # Number of questions from dropdown
+                async for update in reset_interview_action(get_session(request), interviewer, total_questions, language):
+                    yield update
+
+            async def end_interview(chatbot, request: gr.Request):
+                session = get_session(request)
+                session.cancel_tasks()  # Drop speculative work for a next turn that will not come
+                end_message = await atranslate_text(END_MESSAGE, session.language, "english", cacheable=True)
                 chatbot.append({"role": "assistant", "content": end_message})
-                return chatbot, gr.Audio(visible=False), ""
+                return chatbot, None, ""
 
-            def update_settings(audio_status, interviewer_choice, language_choice, questions_choice):
-                global audio_enabled, selected_interviewer, selected_language, total_questions
-                audio_enabled = audio_status
-                selected_interviewer = interviewer_choice
-                selected_language = language_choice
-                total_questions = int(questions_choice)
-                return reset_interview_action(selected_interviewer, total_questions, selected_language)
+            async def update_settings(audio_status, interviewer_choice, language_choice, questions_choice, request: gr.Request):
+                session = get_session(request)
+                session.audio_enabled = audio_status
+                async for update in reset_interview_action(session, interviewer_choice, int(questions_choice), language_choice):
+                    yield update
 
             # Event handlers
             reset_button.click(
@@ -236,7 +232,7 @@ def create_app():
             gr.Markdown('Please upload a document that contains content written about a patient or by the patient.')
             file_input = gr.File(label="Upload a TXT, PDF, or DOCX file")
             language_input = gr.Dropdown(
-                choices=["English", "Spanish", "French", "German", "Italian", "Hindi"],  # Added Hindi
+                choices=SUPPORTED_LANGUAGES,
                 label="Select Language",
                 value="English"
             )
@@ -244,8 +240,8 @@ def create_app():
             report_output = gr.Textbox(label="Generated Report", lines=10, visible=False)
             pdf_output = gr.File(label="Download Report", visible=False)
 
-            def generate_report_and_pdf(file, language):
-                report_content, pdf_path = generate_report_from_file(file, language)
+            async def generate_report_and_pdf(file, language):
+                report_content, pdf_path = await asyncio.to_thread(generate_report_from_file, file, language)
                 return (
                     gr.update(value=report_content, visible=True),
                     gr.update(value=pdf_path, visible=True)
@@ -263,21 +259,31 @@ def create_app():
             gr.Markdown(description_txt)
             gr.Image("hf/appendix/diagram.png", label="System Architecture", width=600)
 
+        # Drop the interview session when the browser tab is closed
+        def close_session(request: gr.Request):
+            sessions.remove(request.session_hash)
+
+        demo.unload(close_session)
+
     return demo
 
 def cleanup():
-    global temp_audio_files, initial_audio_path
-    for audio_file in temp_audio_files:
-        if os.path.exists(audio_file):
-            os.unlink(audio_file)
-    temp_audio_files.clear()
-
-    if initial_audio_path and os.path.exists(initial_audio_path):
-        os.unlink(initial_audio_path)
+    sessions.clear()
 
 if __name__ == "__main__":
+    # Pre-translate fixed questions, greetings and closing messages in the background,
+    # and optionally pre-render their audio (PRERENDER_AUDIO=true)
+    def warm_caches():
+        if os.getenv("WARM_TRANSLATIONS", "true").lower() != "false":
+            warm_translation_cache()
+        if os.getenv("PRERENDER_AUDIO", "false").lower() == "true":
+            prerender_fixed_audio()
+
+    threading.Thread(target=warm_caches, daemon=True).start()
     app = create_app()
     try:
+        # Serve many interviews concurrently from one process
+        app.queue(default_concurrency_limit=int(os.getenv("GRADIO_CONCURRENCY", "32")))
         app.launch(server_name="0.0.0.0", server_port=7860)
 
     finally:
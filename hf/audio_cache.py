@@ -0,0 +1,91 @@
+# audio_cache.py
+import hashlib
+import os
+import threading
+
+# Directory holding cached MP3 files and the maximum total size kept on disk
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "cache/audio")
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+class AudioCache:
+    """
+    Disk cache of synthesized speech keyed by (text, voice, model).
+
+    Each entry is an MP3 file named after the key hash. Reads refresh the file's
+    modification time, and when the directory grows past max_bytes the least recently
+    used files are deleted. Like the translation cache, it is meant for fixed strings only.
+    """
+
+    def __init__(self, directory=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text, voice, model):
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{text_hash}:{voice}:{model}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [entry for entry in os.scandir(self.directory) if entry.is_file() and entry.name.endswith(".mp3")]
+
+    def get(self, text, voice, model):
+        """Return the cached MP3 bytes, or None on a miss."""
+        path = self._path(self.make_key(text, voice, model))
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return audio
+
+    def put(self, text, voice, model, audio):
+        if not audio:
+            return
+        path = self._path(self.make_key(text, voice, model))
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(audio)
+                os.replace(temp_path, path)
+            except OSError as e:
+                print(f"Audio cache error: {e}")
+                return
+            if self._size is None:
+                self._size = sum(entry.stat().st_size for entry in self._entries())
+            else:
+                self._size += len(audio)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        self._size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._size}
+
+# Process-wide audio cache
+audio_cache = AudioCache()
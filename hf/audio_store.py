@@ -0,0 +1,63 @@
+# audio_store.py
+import os
+import threading
+import time
+
+# Idle lifetime of a held clip and the most audio one session may hold
+AUDIO_STORE_TTL_SECONDS = int(os.getenv("AUDIO_STORE_TTL_SECONDS", "900"))
+AUDIO_STORE_MAX_BYTES = int(os.getenv("AUDIO_STORE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+class SessionAudioStore:
+    """
+    Synthesized clips one session holds in memory until they are played.
+
+    Streamed question and greeting audio passes straight to the browser and is never
+    stored; only clips that have to be buffered whole (the closing message, prepared
+    while the report streams) are put here and taken out when they are played. Clips
+    idle for longer than ttl_seconds are dropped, and the oldest ones are dropped when
+    the session holds more than max_bytes. The SessionStore clears a session's store
+    when the session is removed or expires.
+    """
+
+    def __init__(self, ttl_seconds=AUDIO_STORE_TTL_SECONDS, max_bytes=AUDIO_STORE_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clips = {}  # name -> (MP3 bytes, time stored), oldest first
+        self._lock = threading.Lock()
+
+    def put(self, name, audio):
+        """Hold a clip under name, replacing any clip of that name."""
+        if not audio:
+            return
+        with self._lock:
+            self._clips.pop(name, None)
+            self._clips[name] = (audio, time.monotonic())
+            self._expire()
+            while sum(len(clip) for clip, _ in self._clips.values()) > self.max_bytes and len(self._clips) > 1:
+                del self._clips[next(iter(self._clips))]
+
+    def take(self, name):
+        """Remove and return the clip held under name, or None if there is none."""
+        with self._lock:
+            self._expire()
+            entry = self._clips.pop(name, None)
+        return entry[0] if entry is not None else None
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        for name in [name for name, (_, stored) in self._clips.items() if stored < cutoff]:
+            del self._clips[name]
+
+    def clear(self):
+        with self._lock:
+            self._clips.clear()
+
+    @property
+    def nbytes(self):
+        """Bytes of audio held."""
+        with self._lock:
+            return sum(len(clip) for clip, _ in self._clips.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clips)
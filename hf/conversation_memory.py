@@ -0,0 +1,66 @@
+# conversation_memory.py
+import asyncio
+import os
+
+# Number of most recent history entries (questions and answers) kept verbatim in the prompt
+RECENT_HISTORY_ENTRIES = int(os.getenv("RECENT_HISTORY_ENTRIES", "6"))
+
+# Older entries are folded into the summary once at least this many have left the recent window
+SUMMARY_FOLD_ENTRIES = int(os.getenv("SUMMARY_FOLD_ENTRIES", "4"))
+
+class ConversationMemory:
+    """
+    Rolling summary of an interview plus a window of its most recent entries.
+
+    Entries that leave the recent window are folded into the running summary by a
+    background task, so the prompt stays the same size however long the interview
+    runs and no turn waits for a summarization call. The interview history itself is
+    left untouched for the report.
+    """
+
+    def __init__(self, recent_entries=RECENT_HISTORY_ENTRIES, fold_entries=SUMMARY_FOLD_ENTRIES):
+        self.recent_entries = recent_entries
+        self.fold_entries = fold_entries
+        self.summary = ""
+        self.summarized = 0  # Number of history entries already folded into the summary
+        self._task = None
+
+    def context(self, history, question_count):
+        """Return the summary and the entries not yet folded into it, as prompt history."""
+        entries = history[self.summarized:]
+        if self.summary:
+            entries = [f"Summary at Q{question_count}: {self.summary}"] + entries
+        return "\n".join(entries)
+
+    def schedule_update(self, history, summarize):
+        """
+        Start folding the entries that left the recent window into the summary, in the background.
+
+        summarize(summary, entries) is a coroutine function returning the updated summary.
+        Nothing is started while a previous update is still running.
+        """
+        if self._task is not None and not self._task.done():
+            return None
+        end = len(history) - self.recent_entries
+        if end - self.summarized < self.fold_entries:
+            return None
+        self._task = asyncio.create_task(self._fold(list(history[self.summarized:end]), end, summarize))
+        return self._task
+
+    async def _fold(self, entries, end, summarize):
+        try:
+            self.summary = await summarize(self.summary, entries)
+            self.summarized = end
+        except Exception as e:
+            # The entries stay verbatim in the prompt and are folded with the next update
+            print(f"Error updating the interview summary: {str(e)}")
+
+    async def wait(self):
+        """Wait for a running summary update to finish."""
+        if self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
@@ -0,0 +1,112 @@
+# docstore.py
+import bisect
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+import numpy as np
+import pyarrow.parquet as pq
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+# Number of documents kept in memory after being read from disk
+DOCSTORE_CACHE_SIZE = int(os.getenv("DOCSTORE_CACHE_SIZE", "4096"))
+
+class PositionMapping(Mapping):
+    """index_to_docstore_id for stores whose row i holds the document at index position i."""
+
+    def __init__(self, size):
+        self._size = size
+
+    def __getitem__(self, position):
+        # FAISS hands out numpy integers; the docstore expects plain ints
+        position = int(position)
+        if not 0 <= position < self._size:
+            raise KeyError(position)
+        return position
+
+    def __iter__(self):
+        return iter(range(self._size))
+
+    def __len__(self):
+        return self._size
+
+    def vector_ids(self, positions):
+        """Index IDs of the documents at some positions."""
+        return positions
+
+class VectorIdMapping(Mapping):
+    """
+    index_to_docstore_id for indexes holding each document's vector under the sorted
+    vector_id column of documents.parquet, which incremental updates leave with gaps.
+    """
+
+    def __init__(self, vector_ids):
+        self._vector_ids = np.asarray(vector_ids, dtype=np.int64)
+
+    def __getitem__(self, vector_id):
+        position = int(np.searchsorted(self._vector_ids, vector_id))
+        if position >= len(self._vector_ids) or self._vector_ids[position] != vector_id:
+            raise KeyError(vector_id)
+        return position
+
+    def __iter__(self):
+        return iter(self._vector_ids.tolist())
+
+    def __len__(self):
+        return len(self._vector_ids)
+
+    def vector_ids(self, positions):
+        """Index IDs of the documents at some positions."""
+        return self._vector_ids[positions]
+
+class ParquetDocstore(Docstore):
+    """
+    Read-only docstore over documents.parquet, fetching documents by index position on demand.
+    Columns other than the text (id and any metadata) become the document's metadata,
+    together with the document's index position.
+
+    The file is memory-mapped and only the row group holding a requested document is
+    decoded, so opening the store costs a metadata read instead of unpickling every
+    dialogue. Recently used documents are kept in a small LRU cache.
+    """
+
+    def __init__(self, path, cache_size=DOCSTORE_CACHE_SIZE):
+        self.path = path
+        self._file = pq.ParquetFile(path, memory_map=True)
+        metadata = self._file.metadata
+        self._group_starts = []
+        total = 0
+        for group in range(metadata.num_row_groups):
+            self._group_starts.append(total)
+            total += metadata.row_group(group).num_rows
+        self.num_documents = total
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def index_mapping(self):
+        """index_to_docstore_id for this store: by vector_id when the file has that column, else by position."""
+        if "vector_id" not in self._file.schema_arrow.names:
+            return PositionMapping(self.num_documents)
+        return VectorIdMapping(self._file.read(columns=["vector_id"]).column("vector_id").to_numpy())
+
+    def search(self, search):
+        """Return the Document at index position `search`, or an error string if there is none."""
+        if isinstance(search, bool) or not isinstance(search, int) or not 0 <= search < self.num_documents:
+            return f"ID {search} not found."
+        with self._lock:
+            document = self._cache.get(search)
+            if document is not None:
+                self._cache.move_to_end(search)
+                return document
+            group = bisect.bisect_right(self._group_starts, search) - 1
+            table = self._file.read_row_group(group)
+            row = search - self._group_starts[group]
+            metadata = {name: table.column(name)[row].as_py() for name in table.column_names if name != "text"}
+            metadata["position"] = search
+            document = Document(page_content=table.column("text")[row].as_py(), metadata=metadata)
+            self._cache[search] = document
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return document
@@ -0,0 +1,138 @@
+# embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Size of the in-memory LRU, and an optional SQLite file to keep query embeddings across restarts.
+# The persistent store is off by default: it holds only hashes and vectors, but the queries are patient data.
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000"))
+QUERY_EMBEDDING_CACHE_PATH = os.getenv("QUERY_EMBEDDING_CACHE_PATH", "")
+
+def normalize_query(text):
+    """Normalize unicode and whitespace so trivially different queries share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that caches query embeddings, keyed by normalized text and model.
+
+    Lookups go to an in-memory LRU, then to the optional SQLite store, and only then to the
+    wrapped model. Document embedding is passed straight through, since documents are
+    embedded once at index build time. stats() reports hit rates and the time saved.
+    """
+
+    def __init__(self, embeddings, model_name=None, max_entries=QUERY_EMBEDDING_CACHE_SIZE, store_path=QUERY_EMBEDDING_CACHE_PATH):
+        self.embeddings = embeddings
+        self.model_name = model_name or getattr(embeddings, "model", type(embeddings).__name__)
+        self.max_entries = max_entries
+        self.store_path = store_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self._miss_seconds = 0.0
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\x1f{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _db(self):
+        if self._connection is None and self.store_path:
+            try:
+                directory = os.path.dirname(self.store_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                connection = sqlite3.connect(self.store_path, check_same_thread=False)
+                connection.execute("CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+                connection.commit()
+            except (OSError, sqlite3.Error) as e:
+                # An unwritable cache location disables the disk tier instead of failing retrieval
+                print(f"Query embedding cache unavailable at {self.store_path} ({e}); caching in memory only.")
+                self.store_path = None
+                return None
+            self._connection = connection
+        return self._connection
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key):
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+            try:
+                db = self._db()
+                row = db.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone() if db else None
+            except sqlite3.Error as e:
+                print(f"Query embedding cache error: {e}")
+                row = None
+            if row is None:
+                return None
+            vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+            self.store_hits += 1
+            self._remember(key, vector)
+            return vector
+
+    def _store(self, key, vector, elapsed):
+        with self._lock:
+            self.misses += 1
+            self._miss_seconds += elapsed
+            self._remember(key, vector)
+            try:
+                db = self._db()
+                if db:
+                    db.execute("INSERT OR REPLACE INTO query_embeddings (key, vector) VALUES (?, ?)",
+                               (key, np.asarray(vector, dtype=np.float32).tobytes()))
+                    db.commit()
+            except sqlite3.Error as e:
+                print(f"Query embedding cache error: {e}")
+
+    def embed_query(self, text):
+        key = self._key(text)
+        vector = self._lookup(key)
+        if vector is None:
+            start = time.perf_counter()
+            vector = self.embeddings.embed_query(text)
+            self._store(key, vector, time.perf_counter() - start)
+        return vector
+
+    async def aembed_query(self, text):
+        key = self._key(text)
+        vector = self._lookup(key)
+        if vector is None:
+            start = time.perf_counter()
+            vector = await self.embeddings.aembed_query(text)
+            self._store(key, vector, time.perf_counter() - start)
+        return vector
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts):
+        return await self.embeddings.aembed_documents(texts)
+
+    def stats(self):
+        """Hit counts, hit rate, and the embedding time saved, estimated from the average miss latency."""
+        hits = self.memory_hits + self.store_hits
+        lookups = hits + self.misses
+        average_miss = self._miss_seconds / self.misses if self.misses else 0.0
+        return {
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "seconds_saved": hits * average_miss,
+        }
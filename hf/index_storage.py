@@ -0,0 +1,72 @@
+# index_storage.py
+import os
+import numpy as np
+import faiss
+
+# Reading the index and embedding files of a knowledge base. The build folder imports this
+# module too (ann_index.py, embedding_storage.py), so the app and the build tools read them alike.
+
+# Memory-mapped load modes, tried in order. IO_FLAG_MMAP_IFC also maps the vectors of Flat and
+# HNSW indexes, but IVF inverted lists refuse it and only load with IO_FLAG_MMAP alone.
+MMAP_LOAD_MODES = [(name, flags) for name, flags in (
+    ("mmap+ifc", faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)),
+    ("mmap", faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY),
+) if name == "mmap" or hasattr(faiss, "IO_FLAG_MMAP_IFC")]
+
+def read_index_mapped(index_path):
+    """
+    Read a FAISS index memory-mapped with the first of MMAP_LOAD_MODES its type supports, else into RAM.
+
+    Returns:
+        tuple: (index, load mode: "mmap+ifc", "mmap" or "in RAM")
+    """
+    for mode, flags in MMAP_LOAD_MODES:
+        try:
+            return faiss.read_index(index_path, flags), mode
+        except RuntimeError as e:
+            print(f"Index load with {mode} not supported ({str(e).splitlines()[0]}).")
+    print("Memory-mapped index load not supported, reading the index into memory.")
+    return faiss.read_index(index_path), "in RAM"
+
+def base_index(index):
+    """The index inside an IDMap2 wrapper (how the build stores flat and HNSW indexes), or the index itself."""
+    index = faiss.downcast_index(index)
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+
+def scale_path(path):
+    """Side file holding the per-dimension offset and scale of int8 embeddings."""
+    return path[:-len(".npy")] + ".scale.npy" if path.endswith(".npy") else f"{path}.scale.npy"
+
+class QuantizedEmbeddings:
+    """
+    Read-only view over int8 scalar-quantized embeddings that dequantizes rows on access.
+
+    Each dimension is stored as round((x - offset) / scale) - 128, with the per-dimension
+    offset and scale kept in a small side file.
+    """
+
+    def __init__(self, codes, offset, scale):
+        self.codes = codes
+        self.offset = offset
+        self.scale = scale
+        self.shape = codes.shape
+        self.dtype = np.dtype(np.float32)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, rows):
+        return (self.codes[rows].astype(np.float32) + 128) * self.scale + self.offset
+
+def load_embeddings(path):
+    """
+    Memory-map an embeddings.npy file written as float32, float16 or int8.
+
+    float32 and float16 matrices are returned as numpy memory maps, int8 ones wrapped in
+    QuantizedEmbeddings; slicing any of them yields values usable as float32.
+    """
+    embeddings = np.load(path, mmap_mode="r")
+    if embeddings.dtype == np.int8:
+        offset, scale = np.load(scale_path(path))
+        return QuantizedEmbeddings(embeddings, offset, scale)
+    return embeddings
@@ -1,14 +1,423 @@
 # knowledge_retrieval.py
+import json
+import os
+import pickle
 import random
+import re
+import threading
+from collections import Counter
+import faiss
 from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings
-from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableBranch, RunnableLambda, RunnablePassthrough
 from langchain.retrievers import EnsembleRetriever
-from ai_config import openai_api_key
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from ai_config import openai_api_key, http_client, async_http_client
+from docstore import ParquetDocstore
+from embedding_cache import CachedEmbeddings
+from index_storage import base_index, read_index_mapped
+from mmr_retriever import DocumentVectors, MMRRetriever
+from topic_partitions import PartitionRetriever, TopicPartitions
+from sparse_retriever import SparseIndex, SparseRetriever
+from prompt_budget import fit_documents, fit_history, prompt_metrics, REPORT_TOKEN_BUDGET
 from prompt_instructions import get_interview_prompt_sarah, get_interview_prompt_aaron, get_report_prompt
 
+# Default location of the FAISS index built by "make the vectordatabase for the llm/fiss.py"
+KNOWLEDGE_INDEX_PATH = "knowledge/faiss_index_all_documents"
+
+# Newest knowledge base format this app can read (see kb_format.py in the build folder)
+KB_FORMAT_VERSION = 2
+DEFAULT_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# Memory-map the index file so worker processes on one host share its pages through the page cache
+FAISS_MMAP = os.getenv("FAISS_MMAP", "true").lower() != "false"
+
+# Query-time accuracy/speed trade-off for approximate indexes (IVF nprobe, HNSW efSearch)
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+# Upper bound of the efSearch raised for HNSW searches restricted to a specialty
+MAX_FILTERED_EF_SEARCH = int(os.getenv("MAX_FILTERED_EF_SEARCH", "512"))
+
+# Hybrid retrieval: FAISS and BM25 results are merged by weighted reciprocal-rank fusion.
+# SPARSE_WEIGHT=0 disables the BM25 retriever; RRF_K dampens the influence of top ranks.
+DENSE_WEIGHT = float(os.getenv("DENSE_WEIGHT", "0.5"))
+SPARSE_WEIGHT = float(os.getenv("SPARSE_WEIGHT", "0.5"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Optional MMR diversification: MMR_FETCH_K candidates per retriever, of which MMR_K are kept,
+# weighing relevance against novelty by MMR_LAMBDA (1 = relevance only)
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "false").lower() == "true"
+MMR_K = int(os.getenv("MMR_K", "6"))
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "20"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+
+# Partitioned retrieval: once the interview summary names a specialty (TOPIC_MIN_HITS keyword
+# matches), only documents tagged with it are searched, unless that leaves fewer than TOPIC_MIN_DOCUMENTS
+TOPIC_FILTERING = os.getenv("TOPIC_FILTERING", "true").lower() != "false"
+TOPIC_MIN_HITS = int(os.getenv("TOPIC_MIN_HITS", "2"))
+TOPIC_MIN_DOCUMENTS = int(os.getenv("TOPIC_MIN_DOCUMENTS", "200"))
+
+# Number of key terms from the interview history added to the patient's answer in the retrieval query
+RETRIEVAL_QUERY_TERMS = int(os.getenv("RETRIEVAL_QUERY_TERMS", "12"))
+
+# Process-wide registries: vector stores are loaded once and shared read-only
+# across sessions, chains are cached per (llm, language, persona, question count).
+_vector_stores = {}
+_sparse_indexes = {}
+_document_vectors = {}
+_topic_partitions = {}
+# Retrievers restricted to specialties, per (index path, topics)
+_topic_retrievers = {}
+_chain_cache = {}
+# Query embedding caches per embedding model, kept across index reloads
+_query_embeddings = {}
+_registry_lock = threading.Lock()
+
+def _index_signature(index_path):
+    """Return the modification times of the index files, used to detect changes on disk."""
+    signature = []
+    for file_name in ("manifest.json", "index.faiss", "index.pkl", "documents.parquet", "bm25.npz", "bm25_vocab.json"):
+        file_path = os.path.join(index_path, file_name)
+        signature.append(os.path.getmtime(file_path) if os.path.exists(file_path) else None)
+    return tuple(signature)
+
+def _apply_search_params(index):
+    """Set nprobe/efSearch on IVF and HNSW indexes; exact flat indexes are left unchanged."""
+    if faiss.try_extract_index_ivf(index) is not None:
+        faiss.ParameterSpace().set_index_parameter(index, "nprobe", FAISS_NPROBE)
+    elif "HNSW" in type(base_index(index)).__name__:
+        faiss.ParameterSpace().set_index_parameter(index, "efSearch", FAISS_EF_SEARCH)
+
+def _search_params(index, vector_ids):
+    """
+    faiss search parameters restricting a search to some vector IDs, with the index's nprobe/efSearch.
+
+    HNSW graph walks only collect allowed nodes, so efSearch grows with the share of the
+    index left out, up to MAX_FILTERED_EF_SEARCH.
+    """
+    selector = faiss.IDSelectorBatch(vector_ids)
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=FAISS_NPROBE)
+    if "HNSW" in type(base_index(index)).__name__:
+        ef_search = FAISS_EF_SEARCH * index.ntotal // max(len(vector_ids), 1)
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(min(max(ef_search, FAISS_EF_SEARCH), MAX_FILTERED_EF_SEARCH)))
+    return faiss.SearchParameters(sel=selector)
+
+def _resident_memory_mb():
+    """Resident memory of this process in MB (Linux only, 0 elsewhere)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def _read_index(index_file):
+    """
+    Read a FAISS index memory-mapped (see index_storage.read_index_mapped), or into memory when FAISS_MMAP is off.
+
+    Returns:
+        tuple: (index, load mode used)
+    """
+    if FAISS_MMAP:
+        return read_index_mapped(index_file)
+    return faiss.read_index(index_file), "in RAM"
+
+def _load_docstore(index_path, index):
+    """
+    Open the documents of an index: the lazily loaded documents.parquet when the build
+    wrote one, otherwise the legacy pickled docstore in index.pkl.
+    """
+    parquet_path = os.path.join(index_path, "documents.parquet")
+    if os.path.exists(parquet_path):
+        docstore = ParquetDocstore(parquet_path)
+        if docstore.num_documents != index.ntotal:
+            raise ValueError(f"{parquet_path} has {docstore.num_documents} documents but the index has {index.ntotal}")
+        return docstore, docstore.index_mapping()
+    with open(os.path.join(index_path, "index.pkl"), "rb") as f:
+        return pickle.load(f)
+
+def _read_manifest(index_path):
+    """Return the knowledge base manifest, or {} for indexes built before manifests existed."""
+    manifest_path = os.path.join(index_path, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version", 0) > KB_FORMAT_VERSION:
+        raise ValueError(f"{index_path} uses knowledge base format {manifest['format_version']}; "
+                         f"this app reads up to version {KB_FORMAT_VERSION}")
+    return manifest
+
+def _embedding_model_name(manifest):
+    """Embedding model recorded in the manifest, so queries are embedded like the documents."""
+    if manifest.get("embedding_backend", "openai") == "openai":
+        return manifest.get("embedding_model", DEFAULT_EMBEDDING_MODEL)
+    return DEFAULT_EMBEDDING_MODEL
+
+def _get_query_embeddings(model_name):
+    embeddings = _query_embeddings.get(model_name)
+    if embeddings is None:
+        base = OpenAIEmbeddings(model=model_name, openai_api_key=openai_api_key, max_retries=0,
+                                http_client=http_client, http_async_client=async_http_client)
+        embeddings = CachedEmbeddings(base, model_name)
+        _query_embeddings[model_name] = embeddings
+    return embeddings
+
+def embedding_cache_stats():
+    """Hit/miss counters of the query embedding caches, per embedding model."""
+    return {model_name: embeddings.stats() for model_name, embeddings in _query_embeddings.items()}
+
+def _load_vector_store(index_path):
+    rss_before = _resident_memory_mb()
+    manifest = _read_manifest(index_path)
+    embedding_model = _get_query_embeddings(_embedding_model_name(manifest))
+    index, load_mode = _read_index(os.path.join(index_path, "index.faiss"))
+    docstore, index_to_docstore_id = _load_docstore(index_path, index)
+    vector_store = FAISS(embedding_model, index, docstore, index_to_docstore_id)
+    _apply_search_params(vector_store.index)
+    print(f"Knowledge base format {manifest.get('format_version', 'legacy')}, corpus version "
+          f"{manifest.get('corpus_version', '?')}: {index.ntotal} vectors, loaded {load_mode}, "
+          f"resident memory +{_resident_memory_mb() - rss_before:.1f} MB")
+    return vector_store
+
+def get_vector_store(index_path=KNOWLEDGE_INDEX_PATH):
+    """
+    Return the shared FAISS vector store for an index, loading it on first use.
+
+    Args:
+        index_path: Knowledge base directory (manifest.json, index.faiss, documents.parquet),
+            or a legacy index directory with index.pkl
+
+    Returns:
+        FAISS: The vector store, shared by every session in this process
+    """
+    entry = _vector_stores.get(index_path)
+    if entry is not None:
+        return entry[0]
+    with _registry_lock:
+        entry = _vector_stores.get(index_path)
+        if entry is None:
+            entry = (_load_vector_store(index_path), _index_signature(index_path))
+            _vector_stores[index_path] = entry
+            print(f"Loaded knowledge base from {index_path}")
+    return entry[0]
+
+def reload_vector_store(index_path=KNOWLEDGE_INDEX_PATH, force=False):
+    """
+    Reload a vector store if its files changed on disk (or unconditionally with force=True).
+
+    Chains built on the previous store are dropped so new sessions pick up the new index,
+    while sessions already holding a retriever keep working on the old one.
+
+    Returns:
+        bool: True if the store was reloaded
+    """
+    with _registry_lock:
+        entry = _vector_stores.get(index_path)
+        signature = _index_signature(index_path)
+        if entry is not None and not force and entry[1] == signature:
+            return False
+        _vector_stores[index_path] = (_load_vector_store(index_path), signature)
+        _sparse_indexes.pop(index_path, None)
+        _document_vectors.pop(index_path, None)
+        _topic_partitions.pop(index_path, None)
+        for key in [key for key in _topic_retrievers if key[0] == index_path]:
+            del _topic_retrievers[key]
+        for key in [key for key in _chain_cache if key[0] == index_path]:
+            del _chain_cache[key]
+    print(f"Reloaded knowledge base from {index_path}")
+    return True
+
+def get_sparse_index(index_path=KNOWLEDGE_INDEX_PATH):
+    """
+    Return the shared BM25 index stored next to the vector store, loading it on first use.
+
+    Returns:
+        SparseIndex: The index, or None if the build did not write one
+    """
+    if index_path not in _sparse_indexes:
+        with _registry_lock:
+            if index_path not in _sparse_indexes:
+                _sparse_indexes[index_path] = SparseIndex(index_path) if SparseIndex.exists(index_path) else None
+    return _sparse_indexes[index_path]
+
+def get_document_vectors(index_path=KNOWLEDGE_INDEX_PATH):
+    """
+    Return the shared memory-mapped document embeddings of a knowledge base, opening them on first use.
+
+    Returns:
+        DocumentVectors: The embeddings, or None if the knowledge base has no embeddings.npy
+    """
+    if index_path not in _document_vectors:
+        with _registry_lock:
+            if index_path not in _document_vectors:
+                _document_vectors[index_path] = DocumentVectors(index_path) if DocumentVectors.exists(index_path) else None
+    return _document_vectors[index_path]
+
+def get_topic_partitions(index_path=KNOWLEDGE_INDEX_PATH):
+    """
+    Return the shared specialty partitions of a knowledge base, loading them on first use.
+
+    Returns:
+        TopicPartitions: The partitions, or None if the build did not tag documents
+    """
+    if index_path not in _topic_partitions:
+        with _registry_lock:
+            if index_path not in _topic_partitions:
+                _topic_partitions[index_path] = TopicPartitions(index_path) if TopicPartitions.exists(index_path) else None
+    return _topic_partitions[index_path]
+
+def detect_topics(text, index_path=KNOWLEDGE_INDEX_PATH):
+    """
+    Identify the specialties an English text is about, with the build's (English) tagging rules.
+
+    For an interview, pass english_history(session.interview_history): summaries and
+    native-language answers are not in English and would never match.
+
+    Returns:
+        tuple: Sorted specialties, empty if none is clear or the knowledge base is not partitioned
+    """
+    if not TOPIC_FILTERING or not text:
+        return ()
+    partitions = get_topic_partitions(index_path)
+    return partitions.detect(text, min_hits=TOPIC_MIN_HITS) if partitions is not None else ()
+
+def _partition_positions(index_path, topics):
+    """Index positions of the documents of topics, or None to search the whole knowledge base."""
+    partitions = get_topic_partitions(index_path) if topics else None
+    if partitions is None:
+        return None
+    positions = partitions.positions(topics)
+    if len(positions) < TOPIC_MIN_DOCUMENTS:
+        return None
+    return positions
+
+def get_retriever(index_path=KNOWLEDGE_INDEX_PATH, topics=None, **search_kwargs):
+    """
+    Build a lightweight hybrid retriever over the shared vector store and BM25 index.
+
+    The two result lists are merged by reciprocal-rank fusion weighted by DENSE_WEIGHT and
+    SPARSE_WEIGHT; without a BM25 index the FAISS retriever is used alone. With
+    RETRIEVAL_MMR=true each retriever fetches MMR_FETCH_K candidates and MMR_K diverse ones
+    are kept from the fused list, so near-identical dialogues do not fill the prompt.
+    With topics, both searches only consider the documents tagged with those specialties.
+    """
+    document_vectors = get_document_vectors(index_path) if RETRIEVAL_MMR else None
+    if RETRIEVAL_MMR and document_vectors is None:
+        print(f"RETRIEVAL_MMR is set but {index_path} has no embeddings.npy; using plain retrieval.")
+    if document_vectors is not None:
+        search_kwargs = dict(search_kwargs, k=MMR_FETCH_K)
+    vector_store = get_vector_store(index_path)
+    positions = _partition_positions(index_path, topics)
+    if positions is None:
+        retrievers = [vector_store.as_retriever(search_kwargs=search_kwargs)]
+    else:
+        vector_ids = vector_store.index_to_docstore_id.vector_ids(positions)
+        retrievers = [PartitionRetriever(vector_store=vector_store, search_params=_search_params(vector_store.index, vector_ids),
+                                         k=search_kwargs.get("k", 4))]
+    weights = [DENSE_WEIGHT]
+    sparse_index = get_sparse_index(index_path) if SPARSE_WEIGHT > 0 else None
+    if sparse_index is not None:
+        retrievers.append(SparseRetriever(sparse_index=sparse_index, vector_store=vector_store,
+                                          k=search_kwargs.get("k", 4), positions=positions))
+        weights.append(SPARSE_WEIGHT)
+    combined_retriever = EnsembleRetriever(retrievers=retrievers, weights=weights, c=RRF_K)
+    if document_vectors is not None:
+        return MMRRetriever(retriever=combined_retriever, embeddings=vector_store.embedding_function,
+                            vectors=document_vectors, k=MMR_K, lambda_mult=MMR_LAMBDA)
+    return combined_retriever
+
+def get_topic_retriever(retriever, topics, index_path=KNOWLEDGE_INDEX_PATH):
+    """Return retriever itself without topics, otherwise the shared retriever restricted to their partitions."""
+    if not topics or not TOPIC_FILTERING:
+        return retriever
+    key = (index_path, tuple(topics))
+    topic_retriever = _topic_retrievers.get(key)
+    if topic_retriever is None:
+        topic_retriever = get_retriever(index_path, topics=key[1])
+        with _registry_lock:
+            _topic_retrievers[key] = topic_retriever
+    return topic_retriever
+
+# Patient answers ("A3: ...", "A3 (spanish): ...") and running summaries in the interview history
+_HISTORY_CONTENT = re.compile(r"^(?:A\d+(?: \([^)]*\))?|Summary at Q\d+):\s*(.*)$", re.MULTILINE)
+_TERM = re.compile(r"[^\W\d_][\w-]{2,}")
+# Answers kept in the patient's language in native-language sessions ("A3 (spanish): ...")
+_NATIVE_ANSWER = re.compile(r"^A\d+ \([^)]*\):")
+
+def english_history(history):
+    """
+    The English entries of an interview history: every question (native-language sessions
+    store the English shadow copy) and the answers not labelled with another language.
+    """
+    return "\n".join(entry for entry in history if not _NATIVE_ANSWER.match(entry))
+
+def key_terms(text, max_terms=RETRIEVAL_QUERY_TERMS, exclude=()):
+    """
+    Pick the most frequent content words of the patient's answers and summaries in a history.
+
+    Interviewer questions are skipped; text without history labels (a summary or an
+    uploaded file) is used as a whole. Ties keep the order of first appearance.
+    """
+    contents = _HISTORY_CONTENT.findall(text)
+    source = "\n".join(contents) if contents else text
+    excluded = {word.lower() for word in exclude}
+    counts = Counter(word for word in (match.lower() for match in _TERM.findall(source))
+                     if word not in ENGLISH_STOP_WORDS and word not in excluded)
+    return [word for word, _ in counts.most_common(max_terms)]
+
+def build_retrieval_query(message, history, max_terms=RETRIEVAL_QUERY_TERMS):
+    """
+    Build a compact retrieval query: the patient's latest answer plus key terms of the history.
+
+    Args:
+        message: The patient's last response (may be empty, e.g. for reports)
+        history: The interview history as a list or string, or a summary
+        max_terms: Maximum number of history terms to add
+
+    Returns:
+        str: The query embedded and matched by the retrievers instead of the full prompt
+    """
+    combined_history = history if isinstance(history, str) else "\n".join(history)
+    terms = key_terms(combined_history, max_terms, exclude=_TERM.findall(message))
+    return " ".join(part for part in (message.strip(), " ".join(terms)) if part)
+
+def create_query_retrieval_chain(retriever, combine_docs_chain):
+    """
+    Like langchain's create_retrieval_chain, but retrieves on inputs["retrieval_query"] when given.
+
+    The documents chain still receives the full "input" prompt, so the LLM sees the whole
+    instruction while only a short query is embedded. With inputs["topics"] only those
+    specialties' documents are searched. Documents passed in inputs["context"]
+    (e.g. prefetched ones) are used without retrieving. Documents are deduplicated and
+    fitted to the context token budget, and the output carries the prompt's token counts
+    under "metrics".
+    """
+    def retrieve(x, config):
+        return get_topic_retriever(retriever, x.get("topics")).invoke(x.get("retrieval_query") or x["input"], config)
+
+    async def aretrieve(x, config):
+        return await get_topic_retriever(retriever, x.get("topics")).ainvoke(x.get("retrieval_query") or x["input"], config)
+
+    retrieval_docs = RunnableBranch(
+        (lambda x: x.get("context") is not None, lambda x: x["context"]),
+        RunnableLambda(retrieve, afunc=aretrieve),
+    ) | fit_documents
+    return (
+        RunnablePassthrough.assign(context=retrieval_docs.with_config(run_name="retrieve_documents"))
+        .assign(metrics=lambda x: prompt_metrics(x, x["context"]))
+        .assign(answer=combine_docs_chain)
+    ).with_config(run_name="retrieval_chain")
+
+async def aprefetch_context(retriever, history, topics=None):
+    """Retrieve documents for the next question from the history alone, before the patient's answer is known."""
+    return await get_topic_retriever(retriever, topics).ainvoke(build_retrieval_query("", history))
+
 def setup_knowledge_retrieval(llm, language='english', voice='Sarah', total_questions=10):
     """
     Set up the retrieval chains for interview and report generation.
@@ -22,17 +431,14 @@ def setup_knowledge_retrieval(llm, language='english', voice='Sarah', total_ques
     Returns:
         tuple: (interview_retrieval_chain, report_retrieval_chain, combined_retriever)
     """
-    # Load the FAISS index with embeddings
-    embedding_model = OpenAIEmbeddings(openai_api_key=openai_api_key)
-    documents_faiss_index = FAISS.load_local(
-        "knowledge/faiss_index_all_documents",
-        embedding_model,
-        allow_dangerous_deserialization=True
-    )
-    documents_retriever = documents_faiss_index.as_retriever()
+    # Chains are stateless, so they are built once per configuration and shared
+    key = (KNOWLEDGE_INDEX_PATH, id(llm), language, voice, total_questions)
+    chains = _chain_cache.get(key)
+    if chains is not None:
+        return chains
 
-    # Combine retrievers (currently just one, but EnsembleRetriever allows future expansion)
-    combined_retriever = EnsembleRetriever(retrievers=[documents_retriever])
+    # Combine dense and keyword retrieval
+    combined_retriever = get_retriever()
 
     # Select the appropriate interview prompt based on the interviewer
     if voice == 'Sarah':
@@ -56,12 +462,73 @@ def setup_knowledge_retrieval(llm, language='english', voice='Sarah', total_ques
     interview_chain = create_stuff_documents_chain(llm, interview_prompt)
     report_chain = create_stuff_documents_chain(llm, report_prompt)
 
-    interview_retrieval_chain = create_retrieval_chain(combined_retriever, interview_chain)
-    report_retrieval_chain = create_retrieval_chain(combined_retriever, report_chain)
+    interview_retrieval_chain = create_query_retrieval_chain(combined_retriever, interview_chain)
+    report_retrieval_chain = create_query_retrieval_chain(combined_retriever, report_chain)
+
+    chains = (interview_retrieval_chain, report_retrieval_chain, combined_retriever)
+    with _registry_lock:
+        _chain_cache[key] = chains
+    return chains
+
+# Marker separating the question in the interview language from its English shadow copy
+NATIVE_ANSWER_MARKER = "English:"
+
+def _native_instruction(native_language):
+    if not native_language:
+        return ""
+    return (f" The patient may answer in {native_language}. Write the question in {native_language}, "
+            f"then on a new line write '{NATIVE_ANSWER_MARKER}' followed by its English translation.")
+
+def split_native_answer(answer):
+    """
+    Split a native-language answer into (question, english_question).
+
+    While an answer is still streaming the English part may be missing, in which case
+    english_question is None.
+    """
+    question, marker, english = answer.partition(NATIVE_ANSWER_MARKER)
+    if not marker:
+        return answer.strip(), None
+    return question.strip(), english.strip()
+
+def _english_question(answer, native_language):
+    if not native_language:
+        return answer
+    question, english = split_native_answer(answer)
+    return english or question
+
+def _question_inputs(message, combined_history, question_count, native_language=None, context=None, topics=None):
+    combined_history = fit_history(combined_history)
+    return {
+        "context": context,
+        "input": f"Based on the patient's last response: '{message}', and considering the interview history or summary: '{combined_history}', ask a specific, detailed question that hasn’t been asked before and is relevant to the patient’s situation. Ensure the question is unique." + _native_instruction(native_language),
+        "retrieval_query": build_retrieval_query(message, combined_history),
+        "topics": topics,
+        "history": combined_history,
+        "question_number": question_count + 1
+    }
+
+def _retry_inputs(next_question, message, combined_history, question_count, native_language=None, context=None, topics=None):
+    combined_history = fit_history(combined_history)
+    return {
+        "context": context,
+        "input": f"The question '{next_question}' was already asked. Generate a new, unique question based on the patient's last response: '{message}' and the history or summary: '{combined_history}'" + _native_instruction(native_language),
+        "retrieval_query": build_retrieval_query(message, combined_history),
+        "topics": topics,
+        "history": combined_history,
+        "question_number": question_count + 1
+    }
+
+def _record_metrics(metrics, result):
+    """Copy the prompt token counts of a chain result (or streamed chunk) into metrics, if requested."""
+    if metrics is not None and result.get("metrics"):
+        metrics.update(result["metrics"])
 
-    return interview_retrieval_chain, report_retrieval_chain, combined_retriever
+def _is_repeated(next_question, combined_history, question_count, native_language=None):
+    next_question = _english_question(next_question, native_language)
+    return any(f"Q{num}: {next_question}" in combined_history for num in range(1, question_count + 1))
 
-def get_next_response(interview_chain, message, history, question_count, total_questions):
+def get_next_response(interview_chain, message, history, question_count, total_questions, native_language=None, metrics=None, context=None, topics=None):
     """
     Generate the next question based on the patient's response and interview history.
     
@@ -71,6 +538,11 @@ def get_next_response(interview_chain, message, history, question_count, total_q
         history: The full interview history or a summary
         question_count: Current question number
         total_questions: Total number of questions chosen by the user
+        native_language: If set, the question is written in this language followed by an
+            English shadow copy (see split_native_answer)
+        metrics: Optional dict updated with the prompt token counts of the last chain call
+        context: Optional documents to use instead of retrieving (see aprefetch_context)
+        topics: Optional specialties to restrict retrieval to (see detect_topics)
     
     Returns:
         str: The next question to ask
@@ -83,26 +555,80 @@ def get_next_response(interview_chain, message, history, question_count, total_q
     combined_history = history if isinstance(history, str) else "\n".join(history)
 
     # Invoke the chain to generate a unique, context-aware question
-    result = interview_chain.invoke({
-        "input": f"Based on the patient's last response: '{message}', and considering the interview history or summary: '{combined_history}', ask a specific, detailed question that hasn’t been asked before and is relevant to the patient’s situation. Ensure the question is unique.",
-        "history": combined_history,
-        "question_number": question_count + 1
-    })
+    result = interview_chain.invoke(_question_inputs(message, combined_history, question_count, native_language, context, topics))
+    _record_metrics(metrics, result)
 
     next_question = result.get("answer", "Could you provide more details on your current situation?")
     
     # Ensure the question is unique by checking against history
     if isinstance(history, list):
-        while any(f"Q{num}: {next_question}" in combined_history for num in range(1, question_count + 1)):
-            result = interview_chain.invoke({
-                "input": f"The question '{next_question}' was already asked. Generate a new, unique question based on the patient's last response: '{message}' and the history or summary: '{combined_history}'",
-                "history": combined_history,
-                "question_number": question_count + 1
-            })
+        while _is_repeated(next_question, combined_history, question_count, native_language):
+            result = interview_chain.invoke(_retry_inputs(_english_question(next_question, native_language), message, combined_history, question_count, native_language, context, topics))
+            _record_metrics(metrics, result)
             next_question = result.get("answer", "Can you tell me something new about your experience?")
     
     return next_question
 
+async def aget_next_response(interview_chain, message, history, question_count, total_questions, native_language=None, metrics=None, context=None, topics=None):
+    """Async version of get_next_response using the chain's ainvoke."""
+    if question_count >= total_questions:
+        return "Thank you for your responses. I will now prepare a report."
+
+    combined_history = history if isinstance(history, str) else "\n".join(history)
+
+    result = await interview_chain.ainvoke(_question_inputs(message, combined_history, question_count, native_language, context, topics))
+    _record_metrics(metrics, result)
+    next_question = result.get("answer", "Could you provide more details on your current situation?")
+
+    if isinstance(history, list):
+        while _is_repeated(next_question, combined_history, question_count, native_language):
+            result = await interview_chain.ainvoke(_retry_inputs(_english_question(next_question, native_language), message, combined_history, question_count, native_language, context, topics))
+            _record_metrics(metrics, result)
+            next_question = result.get("answer", "Can you tell me something new about your experience?")
+
+    return next_question
+
+async def astream_next_response(interview_chain, message, history, question_count, total_questions, native_language=None, metrics=None, context=None, topics=None):
+    """
+    Stream the next question as it is generated.
+
+    Yields the question text accumulated so far after every token. If the finished
+    question repeats an earlier one, a replacement is generated and yielded as a whole.
+    """
+    if question_count >= total_questions:
+        yield "Thank you for your responses. I will now prepare a report."
+        return
+
+    combined_history = history if isinstance(history, str) else "\n".join(history)
+
+    next_question = ""
+    async for chunk in interview_chain.astream(_question_inputs(message, combined_history, question_count, native_language, context, topics)):
+        _record_metrics(metrics, chunk)
+        if chunk.get("answer"):
+            next_question += chunk["answer"]
+            yield next_question
+    if not next_question:
+        next_question = "Could you provide more details on your current situation?"
+        yield next_question
+
+    if isinstance(history, list):
+        while _is_repeated(next_question, combined_history, question_count, native_language):
+            result = await interview_chain.ainvoke(_retry_inputs(_english_question(next_question, native_language), message, combined_history, question_count, native_language, context, topics))
+            _record_metrics(metrics, result)
+            next_question = result.get("answer", "Can you tell me something new about your experience?")
+            yield next_question
+
+async def astream_answer(retrieval_chain, inputs, default, metrics=None):
+    """Stream the "answer" of a retrieval chain, yielding the text accumulated so far."""
+    answer = ""
+    async for chunk in retrieval_chain.astream(inputs):
+        _record_metrics(metrics, chunk)
+        if chunk.get("answer"):
+            answer += chunk["answer"]
+            yield answer
+    if not answer:
+        yield default
+
 def generate_report(report_chain, history, language):
     """
     Generate a clinical report based on the interview history.
@@ -115,16 +641,27 @@ def generate_report(report_chain, history, language):
     Returns:
         str: The generated clinical report
     """
-    combined_history = "\n".join(history)
+    combined_history = fit_history("\n".join(history), REPORT_TOKEN_BUDGET)
 
     result = report_chain.invoke({
         "input": "Please provide a clinical report based on the interview.",
+        "retrieval_query": build_retrieval_query("", combined_history),
         "history": combined_history,
         "language": language
     })
 
     return result.get("answer", "Unable to generate report due to insufficient information.")
 
+async def agenerate_report(report_chain, history, language):
+    """Async version of generate_report using the chain's ainvoke."""
+    result = await report_chain.ainvoke({
+        "input": "Please provide a clinical report based on the interview.",
+        "retrieval_query": build_retrieval_query("", history),
+        "history": fit_history("\n".join(history), REPORT_TOKEN_BUDGET),
+        "language": language
+    })
+    return result.get("answer", "Unable to generate report due to insufficient information.")
+
 def get_initial_question(interview_chain):
     """
     Generate the first question for the interview (optional utility function).
@@ -0,0 +1,63 @@
+# mmr_retriever.py
+import os
+from typing import Any, List
+import numpy as np
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from index_storage import load_embeddings
+
+class DocumentVectors:
+    """
+    Embeddings of the knowledge base documents (embeddings.npy), memory-mapped and read by index position.
+
+    int8 files are dequantized with their embeddings.scale.npy side file (see index_storage.load_embeddings).
+    """
+
+    def __init__(self, index_path):
+        self.embeddings = load_embeddings(os.path.join(index_path, "embeddings.npy"))
+
+    @staticmethod
+    def exists(index_path):
+        return os.path.exists(os.path.join(index_path, "embeddings.npy"))
+
+    def __getitem__(self, positions):
+        return np.asarray(self.embeddings[np.asarray(positions, dtype=np.int64)], dtype=np.float32)
+
+class MMRRetriever(BaseRetriever):
+    """
+    Re-rank the documents of another retriever by maximal marginal relevance.
+
+    The base retriever fetches more candidates than needed; k of them are then picked one
+    at a time, trading similarity to the query against similarity to the documents already
+    picked (lambda_mult=1 is pure relevance, 0 pure diversity). Documents are matched to
+    their vectors by the "position" metadata of the knowledge base docstore; without it the
+    base ranking is kept.
+    """
+
+    retriever: BaseRetriever
+    embeddings: Any
+    vectors: Any
+    k: int = 4
+    lambda_mult: float = 0.5
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _select(self, query_embedding, documents):
+        positions = [document.metadata.get("position") for document in documents]
+        if len(documents) <= self.k or any(position is None for position in positions):
+            return documents[:self.k]
+        selected = maximal_marginal_relevance(np.asarray(query_embedding, dtype=np.float32), self.vectors[positions],
+                                              lambda_mult=self.lambda_mult, k=self.k)
+        return [documents[i] for i in selected]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return self._select(self.embeddings.embed_query(query), documents)
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        documents = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return self._select(await self.embeddings.aembed_query(query), documents)
@@ -0,0 +1,135 @@
+# prompt_budget.py
+import os
+import re
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Token budgets of the prompt sections: retrieved dialogues, interview history (or summary),
+# and the interview / uploaded file passed to the report prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+REPORT_TOKEN_BUDGET = int(os.getenv("REPORT_TOKEN_BUDGET", "24000"))
+
+# Retrieved dialogues whose word shingles overlap at least this much are treated as duplicates
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
+
+# A document cut to fewer tokens than this is dropped instead of truncated
+MIN_DOCUMENT_TOKENS = 50
+
+TRUNCATION_MARKER = "[...]"
+
+_encoding = None
+
+def _get_encoding():
+    """The chat model's tiktoken encoding, or None if it cannot be loaded (False caches the failure)."""
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is not None:
+            from ai_config import model
+            try:
+                try:
+                    _encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"Token counting falls back to characters/4: {e}")
+    return _encoding or None
+
+def count_tokens(text):
+    """Number of tokens in text for the chat model, or about len/4 when tiktoken is not installed."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _cut_tokens(text, budget, keep="head"):
+    """The first (keep="head") or last (keep="tail") budget tokens of text."""
+    encoding = _get_encoding()
+    if encoding is None:
+        tokens, join = text, "".join
+        budget *= 4
+    else:
+        tokens, join = encoding.encode(text, disallowed_special=()), encoding.decode
+    budget = max(budget, 0)
+    return join(tokens[len(tokens) - budget:] if keep == "tail" else tokens[:budget])
+
+def truncate_tokens(text, budget, keep="head"):
+    """
+    Cut text to at most budget tokens, keeping its beginning (keep="head") or end (keep="tail").
+
+    A marker shows where text was removed.
+    """
+    if count_tokens(text) <= budget:
+        return text
+    budget = budget - count_tokens(TRUNCATION_MARKER) - 1
+    if keep == "tail":
+        return f"{TRUNCATION_MARKER}\n{_cut_tokens(text, budget, keep)}"
+    return f"{_cut_tokens(text, budget, keep)}\n{TRUNCATION_MARKER}"
+
+def fit_history(history, budget=HISTORY_TOKEN_BUDGET):
+    """
+    Fit an interview history to a token budget, keeping the most recent entries.
+
+    Older lines are dropped whole; a single line longer than the budget is cut from its start.
+    One marker at the top shows that the history was shortened.
+    """
+    if count_tokens(history) <= budget:
+        return history
+    kept, used = [], count_tokens(TRUNCATION_MARKER) + 1
+    for line in reversed(history.split("\n")):
+        tokens = count_tokens(line) + 1
+        if used + tokens > budget:
+            if not kept:
+                kept.append(_cut_tokens(line, budget - used, keep="tail"))
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join([TRUNCATION_MARKER] + kept[::-1])
+
+def _shingles(text, size=3):
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+def dedupe_documents(documents, threshold=DUPLICATE_THRESHOLD):
+    """Drop documents whose word 3-shingles overlap an earlier, higher-ranked one by at least threshold (Jaccard)."""
+    kept, kept_shingles = [], []
+    for document in documents:
+        shingles = _shingles(document.page_content)
+        if any(len(shingles & other) >= threshold * len(shingles | other) for other in kept_shingles):
+            continue
+        kept.append(document)
+        kept_shingles.append(shingles)
+    return kept
+
+def fit_documents(documents, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Deduplicate retrieved documents and keep them in rank order until the token budget is used.
+
+    The first document that does not fit is truncated to the remaining budget, or
+    dropped if too little is left.
+    """
+    fitted, used = [], 0
+    for document in dedupe_documents(documents):
+        tokens = count_tokens(document.page_content)
+        if used + tokens > budget:
+            remaining = budget - used
+            if remaining >= MIN_DOCUMENT_TOKENS:
+                fitted.append(document.copy(update={"page_content": truncate_tokens(document.page_content, remaining)}))
+            break
+        fitted.append(document)
+        used += tokens
+    return fitted
+
+def prompt_metrics(inputs, documents):
+    """Token counts of the sections of a chain's prompt, for logging and per-turn metrics."""
+    metrics = {
+        "input_tokens": count_tokens(inputs.get("input", "")),
+        "history_tokens": count_tokens(inputs.get("history", "")),
+        "context_tokens": sum(count_tokens(document.page_content) for document in documents),
+        "documents": len(documents),
+    }
+    metrics["total_tokens"] = metrics["input_tokens"] + metrics["history_tokens"] + metrics["context_tokens"]
+    return metrics
@@ -35,7 +35,7 @@ def get_interview_prompt_sarah(language, total_questions):
     - For question 3, ask: "Where do you live?"
     - For question 4, ask: "What is your current occupation?"
     - For questions 5 onward, generate a specific, detailed question based on the patient's previous responses that hasn’t been asked before.
-    - Every 5 questions (i.e., at question 5, 10, 15, etc.), before asking the next question, provide a concise summary of the conversation so far and use that summary as the basis for the next question instead of the full history.
+    - The history may begin with a running summary of the earlier answers, followed by the most recent questions and answers; use both as the basis for the next question.
     - You must remember all previous answers given by the patient and use this information if necessary.
     - If you perceive particularly special, unusual, or strange things in the answers that require deepening or in-depth understanding, ask about it or direct your question to clarify the matter—this information may hint at the patient’s personality or traits.
     - Keep in mind that you have {total_questions} total questions.
@@ -61,7 +61,7 @@ def get_interview_prompt_aaron(language, total_questions):
     - For question 3, ask: "Where do you live?"
     - For question 4, ask: "What is your current occupation?"
     - For questions 5 onward, generate a specific, detailed question based on the patient's previous responses that hasn’t been asked before.
-    - Every 5 questions (i.e., at question 5, 10, 15, etc.), before asking the next question, provide a concise summary of the conversation so far and use that summary as the basis for the next question instead of the full history.
+    - The history may begin with a running summary of the earlier answers, followed by the most recent questions and answers; use both as the basis for the next question.
     - You must remember all previous answers given by the patient and use this information if necessary.
     - If you perceive particularly special, unusual, or strange things in the answers that require deepening or in-depth understanding, ask about it or direct your question to clarify the matter—this information may hint at the patient’s personality or traits.
     - Keep in mind that you have {total_questions} total questions.
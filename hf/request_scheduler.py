@@ -0,0 +1,428 @@
+# request_scheduler.py
+import asyncio
+import contextvars
+import json
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict, deque
+import httpx
+
+# Requests to the provider in flight at once, over all models
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "32"))
+
+# Per-model quota: concurrent requests, requests per minute and (estimated) tokens per minute.
+# MODEL_LIMITS='{"gpt-4o-mini": {"rpm": 5000, "tpm": 2000000}}' overrides entries.
+DEFAULT_MODEL_LIMITS = {
+    "gpt-4o-mini": {"concurrency": 16, "rpm": 500, "tpm": 200_000},
+    "tts-1-hd": {"concurrency": 8, "rpm": 50},
+    "whisper-1": {"concurrency": 8, "rpm": 50},
+    "text-embedding-ada-002": {"concurrency": 16, "rpm": 3000, "tpm": 1_000_000},
+}
+DEFAULT_MODEL_CONCURRENCY = int(os.getenv("DEFAULT_MODEL_CONCURRENCY", "16"))
+
+# Retries of rate-limited (429) and failed (5xx, connection error) requests, with jittered exponential backoff
+REQUEST_MAX_RETRIES = int(os.getenv("REQUEST_MAX_RETRIES", "4"))
+RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "0.5"))
+RETRY_MAX_SECONDS = float(os.getenv("RETRY_MAX_SECONDS", "20"))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Requests made outside an interview session (cache warming, startup) share one queue
+BACKGROUND = "background"
+
+_current_session = contextvars.ContextVar("request_session", default=BACKGROUND)
+_MULTIPART_MODEL = re.compile(rb'name="model"\r\n\r\n([^\r\n]+)')
+
+def set_request_session(session_id):
+    """Attribute the provider requests made from the current context (a Gradio event) to a session."""
+    _current_session.set(session_id or BACKGROUND)
+
+def _model_limits():
+    limits = {model: dict(values) for model, values in DEFAULT_MODEL_LIMITS.items()}
+    for model, values in json.loads(os.getenv("MODEL_LIMITS", "{}")).items():
+        limits.setdefault(model, {}).update(values)
+    return limits
+
+class TokenBucket:
+    """
+    Rate limiter refilled continuously at per_minute units per minute.
+
+    Callers reserve units and sleep for the returned time, so the bucket serves sync and
+    async callers alike. The burst size is ten seconds' worth of quota.
+    """
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, per_minute / 6)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """Take amount units and return the seconds to wait until they are covered."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+class _Waiter:
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+class FairSemaphore:
+    """
+    Semaphore handing freed slots to waiting sessions in round-robin order.
+
+    Each session has its own queue, so a session with many queued requests does not
+    delay the first request of another. Threads and coroutines (on any event loop) can
+    wait on the same semaphore.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self._queues = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self):
+        if self.in_flight < self.limit and not self._queues:
+            self.in_flight += 1
+            return True
+        return False
+
+    def _enqueue(self, session, wake):
+        waiter = _Waiter(wake)
+        self._queues.setdefault(session, deque()).append(waiter)
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        return waiter
+
+    def acquire(self, session=BACKGROUND):
+        with self._lock:
+            if self._try_acquire():
+                return
+            event = threading.Event()
+            self._enqueue(session, event.set)
+        event.wait()
+
+    async def aacquire(self, session=BACKGROUND):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = self._enqueue(session, lambda: loop.call_soon_threadsafe(_resolve, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.granted:
+                    queue = self._queues[session]
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._queues[session]
+                    self.queued -= 1
+                    raise
+            # The slot was handed over as the wait was cancelled; pass it on
+            self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._queues:
+                self.in_flight -= 1
+                return
+            session, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(session)
+            else:
+                del self._queues[session]
+            self.queued -= 1
+            waiter.granted = True
+        waiter.wake()
+
+    def stats(self):
+        with self._lock:
+            return {"limit": self.limit, "in_flight": self.in_flight, "queued": self.queued,
+                    "peak_queued": self.peak_queued, "sessions_waiting": len(self._queues)}
+
+class RequestScheduler:
+    """
+    Admission control for every request sent to the model provider.
+
+    A request first waits for its model's request and token rate limits, then for a slot
+    of its model and a global slot, both granted fairly across sessions. Rate-limited and
+    failed requests are retried after a jittered backoff without holding a slot.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_REQUESTS, model_limits=None):
+        self.global_slots = FairSemaphore(max_concurrent)
+        self.model_limits = model_limits if model_limits is not None else _model_limits()
+        self._models = {}
+        self._lock = threading.Lock()
+        self.counters = Counter()
+
+    def _model(self, model):
+        quota = self._models.get(model)
+        if quota is None:
+            with self._lock:
+                quota = self._models.get(model)
+                if quota is None:
+                    limits = self.model_limits.get(model, {})
+                    quota = (FairSemaphore(limits.get("concurrency", DEFAULT_MODEL_CONCURRENCY)),
+                             TokenBucket(limits["rpm"]) if limits.get("rpm") else None,
+                             TokenBucket(limits["tpm"]) if limits.get("tpm") else None)
+                    self._models[model] = quota
+        return quota
+
+    def quota_delay(self, model, tokens):
+        """Reserve one request and an estimated token count of a model's quota; return the seconds to wait."""
+        _, requests, token_bucket = self._model(model)
+        delay = max(requests.reserve(1) if requests else 0.0, token_bucket.reserve(tokens) if token_bucket else 0.0)
+        if delay:
+            self.counters["rate_limited"] += 1
+            self.counters["rate_limit_wait_ms"] += int(delay * 1000)
+        return delay
+
+    def acquire(self, model, session):
+        slots = self._model(model)[0]
+        slots.acquire(session)
+        self.global_slots.acquire(session)
+        return self._releaser(slots)
+
+    async def aacquire(self, model, session):
+        slots = self._model(model)[0]
+        await slots.aacquire(session)
+        try:
+            await self.global_slots.aacquire(session)
+        except asyncio.CancelledError:
+            slots.release()
+            raise
+        return self._releaser(slots)
+
+    def _releaser(self, slots):
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.global_slots.release()
+                slots.release()
+        return release
+
+    def retry_delay(self, attempt, response=None):
+        """
+        Seconds to wait before retrying a request, or None if it should not be retried.
+
+        The provider's Retry-After is honoured when given; otherwise the delay is drawn
+        uniformly up to an exponentially growing cap (full jitter).
+        """
+        if response is not None:
+            if response.status_code not in RETRY_STATUS_CODES:
+                return None
+            self.counters["throttled" if response.status_code == 429 else "server_errors"] += 1
+        else:
+            self.counters["transport_errors"] += 1
+        if attempt >= REQUEST_MAX_RETRIES:
+            return None
+        self.counters["retries"] += 1
+        retry_after = None
+        if response is not None:
+            try:
+                if "retry-after-ms" in response.headers:
+                    retry_after = float(response.headers["retry-after-ms"]) / 1000
+                elif "retry-after" in response.headers:
+                    retry_after = float(response.headers["retry-after"])
+            except ValueError:
+                pass
+        if retry_after is not None:
+            return min(retry_after, RETRY_MAX_SECONDS) + random.uniform(0, RETRY_BASE_SECONDS)
+        return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+
+    def stats(self):
+        """Queue depths, in-flight requests and retry counters, globally and per model."""
+        with self._lock:
+            models = dict(self._models)
+        return {"global": self.global_slots.stats(),
+                "models": {model: quota[0].stats() for model, quota in models.items()},
+                **self.counters}
+
+def _describe(request):
+    """Return (model, estimated tokens) of a buffered provider request."""
+    model, tokens = None, len(request.content) // 4
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            model = json.loads(request.content).get("model")
+        except ValueError:
+            pass
+    else:
+        match = _MULTIPART_MODEL.search(request.content)
+        if match:
+            model = match.group(1).decode("utf-8", "replace")
+    return model or request.url.path, tokens
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that gives the request's slots back when the response is closed."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+    def __del__(self):
+        # A response dropped without being closed still frees its slots
+        self._release()
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+    def __del__(self):
+        self._release()
+
+class SchedulingTransport(httpx.BaseTransport):
+    """httpx transport sending every request through a RequestScheduler."""
+
+    def __init__(self, scheduler, transport=None):
+        self.scheduler = scheduler
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request):
+        request.read()  # Buffer the body so it can be sent again
+        model, tokens = _describe(request)
+        session = _current_session.get()
+        self.scheduler.counters["requests"] += 1
+        attempt = 0
+        while True:
+            time.sleep(self.scheduler.quota_delay(model, tokens))
+            release = self.scheduler.acquire(model, session)
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError:
+                release()
+                delay = self.scheduler.retry_delay(attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                release()
+                raise
+            else:
+                delay = self.scheduler.retry_delay(attempt, response)
+                if delay is None:
+                    response.stream = _ReleasingStream(response.stream, release)
+                    return response
+                try:
+                    response.read()
+                    response.close()
+                finally:
+                    release()
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self.transport.close()
+
+class AsyncSchedulingTransport(httpx.AsyncBaseTransport):
+    """
+    Async counterpart of SchedulingTransport.
+
+    Pooled connections belong to the event loop that opened them, and the synchronous
+    entry points run each call in a new loop (asyncio.run), so every event loop gets its
+    own underlying transport from transport_factory, dropped when the loop is.
+    """
+
+    def __init__(self, scheduler, transport_factory=httpx.AsyncHTTPTransport):
+        self.scheduler = scheduler
+        self.transport_factory = transport_factory
+        self._transports = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def transport(self):
+        """The underlying transport of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = self.transport_factory()
+        return transport
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        model, tokens = _describe(request)
+        session = _current_session.get()
+        self.scheduler.counters["requests"] += 1
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.scheduler.quota_delay(model, tokens))
+            release = await self.scheduler.aacquire(model, session)
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError:
+                release()
+                delay = self.scheduler.retry_delay(attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                release()
+                raise
+            else:
+                delay = self.scheduler.retry_delay(attempt, response)
+                if delay is None:
+                    response.stream = _AsyncReleasingStream(response.stream, release)
+                    return response
+                try:
+                    await response.aread()
+                    await response.aclose()
+                finally:
+                    release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+# Process-wide scheduler shared by the chat model, embeddings and audio clients
+scheduler = RequestScheduler()
+
+def scheduler_stats():
+    """Queue depths and retry counters of the provider request scheduler."""
+    return scheduler.stats()
@@ -0,0 +1,169 @@
+# session.py
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from audio_store import SessionAudioStore
+from conversation_memory import ConversationMemory
+
+# Session store limits, configurable through environment variables
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "500"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+
+class InterviewSession:
+    """State of a single interview, owned by one Gradio browser session."""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.interviewer = "Sarah"
+        self.language = "English"
+        self.total_questions = 10
+        self.audio_enabled = False
+        self.question_count = 0
+        self.interview_history = []
+        self.memory = ConversationMemory()
+        self.interview_retrieval_chain = None
+        self.retriever = None
+        self.topics = ()  # Specialties identified from the English history, restricting retrieval
+        self.tasks = set()  # Background work for this session, cancelled on reset
+        self.prefetched_context = None  # (question number, task retrieving its documents)
+        self.translations = set()  # Tasks writing English copies of native-language answers into the history
+        self.turn_metrics = []  # Prompt token counts of each generated question
+        self.audio = SessionAudioStore()  # Buffered clips waiting to be played
+        self.last_active = time.monotonic()
+
+    @property
+    def voice(self):
+        """TTS voice matching the selected interviewer."""
+        return "alloy" if self.interviewer == "Sarah" else "onyx"
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def reset(self, interviewer=None, total_questions=None, language=None):
+        """Start a new interview, optionally changing the settings."""
+        if interviewer is not None:
+            self.interviewer = interviewer
+        if total_questions is not None:
+            self.total_questions = int(total_questions)
+        if language is not None:
+            self.language = language
+        self.question_count = 0
+        self.interview_history = []
+        self.cancel_tasks()
+        self.memory = ConversationMemory()
+        self.interview_retrieval_chain = None
+        self.retriever = None
+        self.topics = ()
+        self.turn_metrics = []
+        self.audio.clear()
+
+    def start_task(self, coroutine):
+        """Run a coroutine in the background, tracked so it can be cancelled with the interview."""
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def start_translation(self, coroutine):
+        """Run a background task that writes an English copy of an answer into the interview history."""
+        task = self.start_task(coroutine)
+        self.translations.add(task)
+        task.add_done_callback(self.translations.discard)
+        return task
+
+    async def wait_for_translations(self):
+        """Wait until the answers given so far have their English copies in the history."""
+        if self.translations:
+            await asyncio.gather(*list(self.translations), return_exceptions=True)
+
+    def cancel_tasks(self):
+        """Cancel the session's background work: speculative prefetches and summary updates."""
+        for task in list(self.tasks):
+            task.cancel()
+        self.tasks.clear()
+        self.prefetched_context = None
+        self.memory.cancel()
+
+    def release(self):
+        """Drop the audio the session holds when it leaves the store."""
+        self.audio.clear()
+
+    def memory_usage(self):
+        """Approximate number of bytes held by the session's interview history and buffered audio."""
+        return (sys.getsizeof(self.interview_history) + sum(sys.getsizeof(entry) for entry in self.interview_history)
+                + sys.getsizeof(self.memory.summary) + self.audio.nbytes)
+
+class SessionStore:
+    """
+    Bounded, thread-safe store of interview sessions.
+
+    Sessions idle for longer than ttl_seconds are evicted, and when the store is full
+    the least recently used session is dropped to make room for a new one.
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl_seconds=SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Return the session for session_id, creating it if needed."""
+        with self._lock:
+            self._evict_expired()
+            session = self._sessions.get(session_id)
+            if session is None:
+                while len(self._sessions) >= self.max_sessions:
+                    _, evicted = self._sessions.popitem(last=False)
+                    evicted.release()
+                session = InterviewSession(session_id)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.touch()
+            return session
+
+    def remove(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.release()
+
+    def clear(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.release()
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_active >= cutoff:
+                break
+            del self._sessions[session_id]
+            session.release()
+
+    def memory_usage(self):
+        """Approximate number of bytes held by all active sessions."""
+        with self._lock:
+            return sum(session.memory_usage() for session in self._sessions.values())
+
+    def stats(self):
+        with self._lock:
+            self._evict_expired()
+            active = len(self._sessions)
+        with self._lock:
+            audio_bytes = sum(session.audio.nbytes for session in self._sessions.values())
+        return {"active_sessions": active, "max_sessions": self.max_sessions, "memory_bytes": self.memory_usage(),
+                "audio_bytes": audio_bytes}
+
+    def __len__(self):
+        return len(self._sessions)
+
+# Process-wide session store used by the Gradio app
+sessions = SessionStore()
@@ -1,4 +1,5 @@
 # settings.py
+import asyncio
 import traceback
 from datetime import datetime
 from pathlib import Path
@@ -15,31 +16,40 @@ from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_JUSTIFY
-from ai_config import load_model, openai_api_key, convert_text_to_speech
-from knowledge_retrieval import setup_knowledge_retrieval, generate_report, get_next_response
+from ai_config import load_model, openai_api_key, convert_text_to_speech, aconvert_text_to_speech, astream_text_to_speech, tts_model
+from translation_cache import translation_cache
+from audio_cache import audio_cache
+from prompt_instructions import get_interview_initial_message_sarah, get_interview_initial_message_aaron
+from knowledge_retrieval import setup_knowledge_retrieval, generate_report, aget_next_response, astream_next_response, astream_answer, get_vector_store, split_native_answer, build_retrieval_query, aprefetch_context, detect_topics, english_history
+from prompt_budget import fit_history, truncate_tokens, REPORT_TOKEN_BUDGET
 
 # Initialize settings
 current_datetime = datetime.now()
 human_readable_datetime = current_datetime.strftime("%B %d, %Y at %H:%M")
 current_date = current_datetime.strftime("%Y-%m-%d")
 
-# Global variables
-total_questions = 10  # Default number of questions, user can change this via UI
-question_count = 0
-interview_history = []
-last_audio_path = None
-initial_audio_path = None
-language = None  # Will be set via UI
+# Stream questions and reports token by token into the UI (set STREAM_RESPONSES=false to disable)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() != "false"
+
+# Native-language mode: the interview chain reads the patient's own words and replies directly in the
+# interview language, keeping an English shadow copy of each question for the report.
+# Set NATIVE_LANGUAGE_MODE=false to translate every message through translate_text instead.
+NATIVE_LANGUAGE_MODE = os.getenv("NATIVE_LANGUAGE_MODE", "true").lower() != "false"
+
+# Speculatively retrieve the next question's context from the history while the patient is answering.
+# Off by default: the prefetched documents replace retrieval on the answer itself, trading their
+# relevance to what the patient just said for a shorter wait (set PREFETCH_CONTEXT=true to enable).
+PREFETCH_CONTEXT = os.getenv("PREFETCH_CONTEXT", "false").lower() == "true"
+
+# Global variables (interview state lives in per-session InterviewSession objects, see session.py)
 knowledge_base_connected = False
 llm = None
-interview_retrieval_chain = None
-report_retrieval_chain = None
-combined_retriever = None
 
 # Initialize the model and retrieval chain
 try:
     llm = load_model(openai_api_key)
-    # Note: setup_knowledge_retrieval will be called later with language from UI
+    # Load the vector store once per process; chains are built later with language from UI
+    get_vector_store()
     knowledge_base_connected = True
     print("Successfully connected to the language model.")
 except Exception as e:
@@ -47,6 +57,9 @@ except Exception as e:
     knowledge_base_connected = False
     print("Falling back to basic mode without knowledge base.")
 
+# Languages offered in the UI
+SUPPORTED_LANGUAGES = ["English", "Spanish", "French", "German", "Italian", "Hindi"]
+
 # Define the four fixed questions in English
 FIXED_QUESTIONS = [
     "What is your name?",
@@ -55,119 +68,376 @@ FIXED_QUESTIONS = [
     "What is your current occupation?"
 ]
 
+# Fixed messages shown around the questions
+REPORT_NOTICE = "Thank you, I will now prepare your report."
+FALLBACK_QUESTION = "Can you elaborate on that?"
+CONCLUSION_MESSAGE = "Thank you for participating in this interview. We have reached the end of our session. I hope this conversation has been helpful. Take care!"
+END_MESSAGE = "The interview has been ended by the user."
+
+def get_initial_message(interviewer, language, total_questions):
+    """Return the English greeting of the selected interviewer."""
+    if interviewer == "Sarah":
+        return get_interview_initial_message_sarah(language, total_questions)
+    return get_interview_initial_message_aaron(language, total_questions)
+
+def fixed_messages(language):
+    """All fixed English strings an interview in the given language can show."""
+    messages = FIXED_QUESTIONS + [REPORT_NOTICE, FALLBACK_QUESTION, CONCLUSION_MESSAGE, END_MESSAGE]
+    for total_questions in range(10, 26):
+        for interviewer in ("Sarah", "Aaron"):
+            messages.append(get_initial_message(interviewer, language, total_questions))
+    return messages
+
 # Translation function using OpenAI LLM
-def translate_text(text, target_language, source_language="english"):
+def translate_text(text, target_language, source_language="english", cacheable=False):
+    """
+    Translate text with the LLM.
+
+    Fixed strings should pass cacheable=True so their translation is looked up in, and
+    stored to, the persistent translation cache. Patient data is never cached.
+    """
     if target_language.lower() == source_language.lower():
         return text
+    if cacheable:
+        cached = translation_cache.get(text, source_language, target_language)
+        if cached is not None:
+            return cached
     prompt = f"Translate the following text from {source_language} to {target_language}: {text}"
     try:
         response = llm.invoke(prompt)
-        return response.content if hasattr(response, 'content') else str(response)
+        translation = response.content if hasattr(response, 'content') else str(response)
     except Exception as e:
         print(f"Translation error: {str(e)}")
         return text  # Fallback to original text if translation fails
+    if cacheable:
+        translation_cache.put(text, source_language, target_language, translation)
+    return translation
+
+async def atranslate_text(text, target_language, source_language="english", cacheable=False):
+    """Async version of translate_text using the model's ainvoke."""
+    if target_language.lower() == source_language.lower():
+        return text
+    if cacheable:
+        cached = translation_cache.get(text, source_language, target_language)
+        if cached is not None:
+            return cached
+    prompt = f"Translate the following text from {source_language} to {target_language}: {text}"
+    try:
+        response = await llm.ainvoke(prompt)
+        translation = response.content if hasattr(response, 'content') else str(response)
+    except Exception as e:
+        print(f"Translation error: {str(e)}")
+        return text
+    if cacheable:
+        translation_cache.put(text, source_language, target_language, translation)
+    return translation
+
+def warm_translation_cache(languages=None, max_workers=4):
+    """
+    Pre-translate every fixed string into the given languages (all UI languages by default).
+
+    Strings already in the persistent cache are skipped, so after the first run this
+    costs no LLM calls.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    jobs = []
+    for language in languages or SUPPORTED_LANGUAGES:
+        if language.lower() == "english":
+            continue
+        for text in fixed_messages(language):
+            if translation_cache.get(text, "english", language) is None:
+                jobs.append((text, language))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(lambda job: translate_text(job[0], job[1], "english", cacheable=True), jobs))
+    print(f"Translation cache warmed: {len(jobs)} new translations")
+    return len(jobs)
+
+def prerender_fixed_audio(languages=None, voices=("alloy", "onyx"), max_workers=4):
+    """
+    Synthesize every fixed string in the given languages into the audio cache.
+
+    Fixed questions and closing messages are rendered in every voice, greetings only in
+    their interviewer's voice. Entries already cached are skipped.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    greeting_voices = {"Sarah": "alloy", "Aaron": "onyx"}
+    jobs = []
+    for language in languages or SUPPORTED_LANGUAGES:
+        texts = [(text, voices) for text in FIXED_QUESTIONS + [REPORT_NOTICE, FALLBACK_QUESTION, CONCLUSION_MESSAGE, END_MESSAGE]]
+        for total_questions in range(10, 26):
+            for interviewer, voice in greeting_voices.items():
+                if voice in voices:
+                    texts.append((get_initial_message(interviewer, language, total_questions), (voice,)))
+        for text, text_voices in texts:
+            translated = translate_text(text, language, "english", cacheable=True)
+            for voice in text_voices:
+                if audio_cache.get(translated, voice, tts_model) is None:
+                    jobs.append((translated, voice))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(lambda job: convert_text_to_speech(job[0], io.BytesIO(), job[1], cacheable=True), jobs))
+    print(f"Audio cache warmed: {len(jobs)} new recordings")
+    return len(jobs)
+
+async def astream_translate_text(text, target_language, source_language="english", cacheable=False):
+    """Stream a translation, yielding the translated text accumulated so far."""
+    if target_language.lower() == source_language.lower() or not STREAM_RESPONSES:
+        yield await atranslate_text(text, target_language, source_language, cacheable)
+        return
+    if cacheable:
+        cached = translation_cache.get(text, source_language, target_language)
+        if cached is not None:
+            yield cached
+            return
+    prompt = f"Translate the following text from {source_language} to {target_language}: {text}"
+    translated = ""
+    try:
+        async for chunk in llm.astream(prompt):
+            translated += chunk.content if hasattr(chunk, 'content') else str(chunk)
+            yield translated
+    except Exception as e:
+        print(f"Translation error: {str(e)}")
+    if not translated:
+        yield text
+    elif cacheable:
+        translation_cache.put(text, source_language, target_language, translated)
+
+def astream_session_speech(session, text, cacheable=False):
+    """Stream speech for text in the session's voice, straight to the caller without keeping a copy."""
+    return astream_text_to_speech(text, session.voice, cacheable)
 
 def generate_random_string(length=5):
     return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
 
-def respond(chatbot, message, voice, selected_interviewer, audio_enabled, selected_language):
-    global question_count, interview_history, combined_retriever, last_audio_path, initial_audio_path, language, interview_retrieval_chain, report_retrieval_chain
+def respond(session, chatbot, message):
+    """Synchronous entry point for arespond, for callers outside an event loop."""
+    return asyncio.run(arespond(session, chatbot, message))
+
+async def arespond(session, chatbot, message):
+    """
+    Process the patient's answer and produce the next question for one interview session.
+
+    Args:
+        session: The InterviewSession the answer belongs to
+        chatbot: Current chatbot history
+        message: The patient's answer, in English or, in native-language mode, in the session language
+
+    Returns:
+        tuple: ([(None, question)], speech) where speech is the MP3 bytes of the question or None
+    """
+    question, speech_stream = None, None
+    async for question, speech_stream in astream_respond(session, chatbot, message):
+        pass
+    speech = b"".join([chunk async for chunk in speech_stream]) if speech_stream is not None else None
+    # The event loop of a synchronous caller ends with this call, so let the summary update and translations finish
+    await session.memory.wait()
+    await session.wait_for_translations()
+    return [(None, question)], speech
+
+async def _astore_english_answer(history, position, question_count, message, language):
+    """
+    Replace a native-language answer in the interview history with its English translation.
+
+    The labelled original ("A3 (spanish): ...") is kept if the translation fails.
+    """
+    english = await atranslate_text(message, "english", language)
+    if english != message and position < len(history) and history[position].startswith(f"A{question_count} ("):
+        history[position] = f"A{question_count}: {english}"
+
+def uses_native_language(session):
+    """True if the session's turns skip translation and run in the interview language."""
+    return NATIVE_LANGUAGE_MODE and session.language.strip().lower() != "english"
+
+def _likely_next_messages(session):
+    """Fixed English messages the next turn may show, and the subset of them that is spoken."""
+    next_count = session.question_count + 1
+    if next_count <= 4:
+        spoken = [FIXED_QUESTIONS[next_count - 1]]
+    elif not knowledge_base_connected:
+        spoken = [FALLBACK_QUESTION]
+    elif next_count >= session.total_questions:
+        spoken = [CONCLUSION_MESSAGE]
+    else:
+        spoken = []
+    shown = [REPORT_NOTICE] if next_count >= session.total_questions else []
+    return spoken + shown + [END_MESSAGE], spoken
+
+async def _awarm_messages(session, messages, spoken):
+    """Translate, and if audio is on synthesize, messages into the caches so the next turn finds them there."""
+    for text in messages:
+        translated = await atranslate_text(text, session.language, "english", cacheable=True)
+        if session.audio_enabled and text in spoken and audio_cache.get(translated, session.voice, tts_model) is None:
+            try:
+                await aconvert_text_to_speech(translated, io.BytesIO(), session.voice, cacheable=True)
+            except Exception as e:
+                print(f"Error prerendering audio: {str(e)}")
+
+async def _aprefetch_context(retriever, history, topics):
+    try:
+        return await aprefetch_context(retriever, history, topics)
+    except Exception as e:
+        print(f"Error prefetching context: {str(e)}")
+        return None
+
+def start_prefetch(session):
+    """
+    Prepare the next turn in the background while the patient answers.
+
+    Fixed and closing messages the next turn may show are warmed in the translation and
+    audio caches. With PREFETCH_CONTEXT, if the next question is generated, its knowledge
+    base context is also retrieved from the history so far, leaving only the LLM call for
+    when the answer arrives. The work is cancelled when the session is reset or ended.
+    """
+    messages, spoken = _likely_next_messages(session)
+    session.start_task(_awarm_messages(session, messages, spoken))
+    next_count = session.question_count + 1
+    if PREFETCH_CONTEXT and knowledge_base_connected and session.retriever is not None and 4 < next_count < session.total_questions:
+        task = session.start_task(_aprefetch_context(session.retriever, list(session.interview_history), session.topics))
+        session.prefetched_context = (next_count, task)
+
+async def _take_prefetched_context(session):
+    """Return the documents prefetched for the current question, waiting if retrieval is still running."""
+    prefetched, session.prefetched_context = session.prefetched_context, None
+    if prefetched is None or prefetched[0] != session.question_count or prefetched[1].cancelled():
+        return None
+    return await prefetched[1]
+
+async def _astream_question(session, message, history_str, metrics=None, context=None):
+    """
+    Yield (question_english, question_native) for the current turn, token by token when it is generated.
+
+    question_native is only set for questions generated in native-language mode; the others
+    are produced in English and still need translating. Prompt token counts of generated
+    questions are written to metrics; context holds prefetched documents, if any. Retrieval
+    is restricted to the specialties in session.topics.
+    """
+    question_count = session.question_count
+    total_questions = session.total_questions
+    native_language = session.language if uses_native_language(session) else None
+    if question_count <= 4:
+        yield FIXED_QUESTIONS[question_count - 1], None  # Use fixed questions for 1-4
+    elif not knowledge_base_connected:
+        yield FALLBACK_QUESTION, None  # Fallback mode (no knowledge base)
+    elif question_count >= total_questions:
+        yield REPORT_NOTICE, None
+    else:
+        if STREAM_RESPONSES:
+            answers = astream_next_response(session.interview_retrieval_chain, message, history_str, question_count, total_questions, native_language, metrics, context, session.topics)
+        else:
+            answers = _single(aget_next_response(session.interview_retrieval_chain, message, history_str, question_count, total_questions, native_language, metrics, context, session.topics))
+        async for answer in answers:
+            if native_language:
+                question, question_english = split_native_answer(answer)
+                yield question_english or question, question
+            else:
+                yield answer, None
+
+async def _single(awaitable):
+    yield await awaitable
 
+async def astream_respond(session, chatbot, message):
+    """
+    Streaming version of arespond.
+
+    Yields (question_so_far, None) while the question is being generated or translated,
+    then (question, speech_stream) once the question is complete. speech_stream is an async
+    iterator of MP3 chunks if audio is enabled for the session, otherwise None.
+    """
     if not isinstance(chatbot, list):
         chatbot = []
     if not isinstance(message, str):
         message = str(message)
 
-    # Translate user input from selected language to English
-    translated_message = translate_text(message, "english", selected_language)
-    question_count += 1
-    interview_history.append(f"A{question_count}: {translated_message}")
-    history_str = "\n".join(interview_history)
+    selected_language = session.language
+
+    session.question_count += 1
+    question_count = session.question_count
+    total_questions = session.total_questions
+    if uses_native_language(session):
+        # The chain reads the answer in the patient's language; the English copy replacing it in the
+        # history (for the report, retrieval and topic detection) is translated while the question is generated
+        session.interview_history.append(f"A{question_count} ({selected_language}): {message}")
+        session.start_translation(_astore_english_answer(session.interview_history, len(session.interview_history) - 1,
+                                                         question_count, message, selected_language))
+    else:
+        session.interview_history.append(f"A{question_count}: {message}")
+    history_str = "\n".join(session.interview_history)
     print("Processing question", question_count)
 
     try:
         if knowledge_base_connected:
             if question_count == 1:
-                # Set language from UI parameter and initialize retrieval chain
-                language = selected_language.strip().lower()
-                interview_retrieval_chain, report_retrieval_chain, combined_retriever = setup_knowledge_retrieval(
-                    llm, language, selected_interviewer, total_questions)
-                question_english = FIXED_QUESTIONS[0]  # "What is your name?"
-            elif question_count <= 4:
-                question_english = FIXED_QUESTIONS[question_count - 1]  # Use fixed questions for 1-4
-            else:
-                if question_count % 5 == 0:
-                    summary = generate_summary(interview_history, language)
-                    interview_history.append(f"Summary at Q{question_count}: {summary}")
-                    history_str = summary
-                else:
-                    history_str = "\n".join(interview_history)
-
-                if question_count < total_questions:
-                    question_english = get_next_response(interview_retrieval_chain, translated_message, history_str, question_count, total_questions)
-                else:
-                    question_english = "Thank you, I will now prepare your report."
-                    speech_file_path = None
-
-            # Translate question to selected language
-            question = translate_text(question_english, selected_language)
-
-            # Generate audio only if audio_enabled is True
-            speech_file_path = None
-            if question and question_count < total_questions and audio_enabled:
-                random_suffix = generate_random_string()
-                speech_file_path = Path(__file__).parent / f"question_{question_count}_{random_suffix}.mp3"
-                convert_text_to_speech(question, speech_file_path, voice)  # Audio in selected language
-                print(f"Question {question_count} saved as audio at {speech_file_path}")
-                if last_audio_path and os.path.exists(last_audio_path):
-                    os.remove(last_audio_path)
-                last_audio_path = speech_file_path
-
-        else:
-            # Fallback mode (no knowledge base)
-            if question_count <= 4:
-                question_english = FIXED_QUESTIONS[question_count - 1]
+                # Set language from the session and initialize retrieval chain
+                session.interview_retrieval_chain, _, session.retriever = setup_knowledge_retrieval(
+                    llm, selected_language.strip().lower(), session.interviewer, total_questions)
             else:
-                question_english = f"Can you elaborate on that?"
-            question = translate_text(question_english, selected_language)
-
-            speech_file_path = None
-            if question_count < total_questions and audio_enabled:
-                speech_file_path = Path(__file__).parent / f"question_{question_count}.mp3"
-                convert_text_to_speech(question, speech_file_path, voice)
-                print(f"Question {question_count} saved as audio at {speech_file_path}")
-                if last_audio_path and os.path.exists(last_audio_path):
-                    os.remove(last_audio_path)
-                last_audio_path = speech_file_path
+                # Running summary of older entries plus the most recent ones, kept up to date in the background
+                history_str = session.memory.context(session.interview_history, question_count)
+                # Search only the specialties the English questions and answers are about, once they name one
+                topics = detect_topics(english_history(session.interview_history))
+                if topics and topics != session.topics:
+                    print(f"Restricting retrieval to: {', '.join(topics)}")
+                session.topics = topics or session.topics
+
+        # English and native-language questions are shown as they are generated; others stream their translation
+        english_session = selected_language.strip().lower() == "english"
+        question_english, question = None, None
+        metrics = {}
+        context = await _take_prefetched_context(session)
+        async for question_english, question in _astream_question(session, message, history_str, metrics, context):
+            if english_session:
+                yield question_english, None
+            elif question is not None:
+                yield question, None
+        if metrics:
+            session.turn_metrics.append(dict(metrics, question=question_count + 1))
+            print(f"Prompt tokens for question {question_count + 1}: {metrics['total_tokens']} "
+                  f"(input {metrics['input_tokens']}, history {metrics['history_tokens']}, "
+                  f"context {metrics['context_tokens']} in {metrics['documents']} documents)")
+
+        fixed_question = question is None and (question_english in FIXED_QUESTIONS or question_english in (REPORT_NOTICE, FALLBACK_QUESTION))
+        if question is None:
+            question = question_english
+            async for question in astream_translate_text(question_english, selected_language, cacheable=fixed_question):
+                if not english_session:
+                    yield question, None
+
+        # Stream audio only if audio is enabled for the session; synthesis starts when the caller reads it
+        speech_stream = None
+        if question and question_count < total_questions and session.audio_enabled:
+            speech_stream = astream_session_speech(session, question, cacheable=fixed_question)  # Audio in selected language
 
         if question_count < total_questions:
-            interview_history.append(f"Q{question_count + 1}: {question_english}")  # Store English version for LLM
+            session.interview_history.append(f"Q{question_count + 1}: {question_english}")  # Store English version for LLM
+            if knowledge_base_connected:
+                summary_language = selected_language.strip().lower()
+                session.memory.schedule_update(session.interview_history,
+                                               lambda summary, entries: aupdate_summary(summary, entries, summary_language))
+            start_prefetch(session)
 
-        response = [(None, question)]
-        return response, speech_file_path
+        yield question, speech_stream
 
     except Exception as e:
         print(f"Error in retrieval chain: {str(e)}")
-        return [(None, f"Error occurred: {str(e)}")], None
-
-def generate_summary(history, language):
-    """Generate a concise summary of the conversation so far."""
-    combined_history = "\n".join(history)
-    summary_prompt = f"""Summarize the following interview history concisely in {language}, focusing on key points:
-    {combined_history}"""
-    
-    result = llm.invoke(summary_prompt)
+        yield f"Error occurred: {str(e)}", None
+
+async def aupdate_summary(summary, entries, language):
+    """Fold new interview entries into the running summary, without re-reading the whole history."""
+    new_entries = "\n".join(entries)
+    summary_prompt = f"""Update the summary of a clinical interview with the new questions and answers below.
+    Write the updated summary concisely in {language}, focusing on key points and keeping every relevant fact from the current summary.
+    Current summary:
+    {summary or "(none yet)"}
+    New questions and answers:
+    {new_entries}"""
+
+    result = await llm.ainvoke(summary_prompt)
     return result.content if hasattr(result, 'content') else str(result)
 
-def reset_interview():
-    """Reset the interview state."""
-    global question_count, interview_history, last_audio_path, initial_audio_path
-    question_count = 0
-    interview_history = []
-    if last_audio_path and os.path.exists(last_audio_path):
-        os.remove(last_audio_path)
-    last_audio_path = None
-    initial_audio_path = None
+def reset_interview(session):
+    """Reset the interview state of a session."""
+    session.reset()
 
 def read_file(file):
     if file is None:
@@ -197,7 +467,7 @@ def generate_report_from_file(file, language):
         if file_content in ["No file uploaded", "Unsupported file format", "Unable to read file"]:
             return file_content, None
 
-        file_content = file_content[:100000]
+        file_content = truncate_tokens(file_content, REPORT_TOKEN_BUDGET)
         report_language = language.strip().lower() if language else "english"
         print(f"Generating report in language: {report_language}")
 
@@ -206,6 +476,7 @@ def generate_report_from_file(file, language):
 
         result = report_retrieval_chain.invoke({
             "input": "Please provide a clinical report based on the following content:",
+            "retrieval_query": build_retrieval_query("", file_content),
             "history": file_content,
             "language": report_language
         })
@@ -216,21 +487,48 @@ def generate_report_from_file(file, language):
         return f"An error occurred while processing the file: {str(e)}", None
 
 def generate_interview_report(interview_history, language):
+    """Synchronous entry point for agenerate_interview_report."""
+    return asyncio.run(agenerate_interview_report(interview_history, language))
+
+async def agenerate_interview_report(interview_history, language):
+    report_content, pdf_path = None, None
+    async for report_content, pdf_path in astream_interview_report(interview_history, language):
+        pass
+    return report_content, pdf_path
+
+async def astream_interview_report(interview_history, language):
+    """
+    Stream the interview report.
+
+    Yields (report_so_far, None) while the report is generated, then (report, pdf_path).
+    """
     try:
         report_language = language.strip().lower() if language else "english"
         print(f"Preferred report language: {report_language}")
         _, report_retrieval_chain, _ = setup_knowledge_retrieval(llm, report_language)
 
-        result = report_retrieval_chain.invoke({
+        inputs = {
             "input": "Please provide a clinical report based on the following interview:",
-            "history": "\n".join(interview_history),
+            "retrieval_query": build_retrieval_query("", interview_history),
+            "history": fit_history("\n".join(interview_history), REPORT_TOKEN_BUDGET),
             "language": report_language
-        })
-        report_content = result.get("answer", "Unable to generate report due to insufficient information.")
-        pdf_path = create_pdf(report_content)
-        return report_content, pdf_path
+        }
+        default_report = "Unable to generate report due to insufficient information."
+        metrics = {}
+        if STREAM_RESPONSES:
+            report_content = default_report
+            async for report_content in astream_answer(report_retrieval_chain, inputs, default_report, metrics):
+                yield report_content, None
+        else:
+            result = await report_retrieval_chain.ainvoke(inputs)
+            metrics.update(result.get("metrics", {}))
+            report_content = result.get("answer", default_report)
+        if metrics:
+            print(f"Prompt tokens for the report: {metrics['total_tokens']}")
+        pdf_path = await asyncio.to_thread(create_pdf, report_content)
+        yield report_content, pdf_path
     except Exception as e:
-        return f"An error occurred while generating the report: {str(e)}", None
+        yield f"An error occurred while generating the report: {str(e)}", None
 
 def create_pdf(content):
     random_string = generate_random_string()
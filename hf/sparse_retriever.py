@@ -0,0 +1,75 @@
+# sparse_retriever.py
+import json
+import os
+from typing import Any, List
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+class SparseIndex:
+    """
+    BM25 index written by the build next to the FAISS index (bm25.npz, bm25_vocab.json).
+
+    Row t of the weight matrix holds the precomputed BM25 weight of term t in every
+    document, with documents in FAISS index order, so a query is scored by summing the
+    rows of its terms; no embedding call is needed.
+    """
+
+    def __init__(self, index_path):
+        self.weights = sp.load_npz(os.path.join(index_path, "bm25.npz")).tocsr()
+        with open(os.path.join(index_path, "bm25_vocab.json")) as f:
+            config = json.load(f)
+        self.vectorizer = CountVectorizer(token_pattern=config["token_pattern"], stop_words=config["stop_words"],
+                                          vocabulary=config["vocabulary"])
+        self.num_documents = self.weights.shape[1]
+
+    @staticmethod
+    def exists(index_path):
+        return all(os.path.exists(os.path.join(index_path, name)) for name in ("bm25.npz", "bm25_vocab.json"))
+
+    def search(self, query, k=4, positions=None):
+        """
+        Return up to k (position, score) pairs for documents sharing terms with the query, best first.
+
+        positions (sorted index positions) restricts the search to those documents.
+        """
+        terms = self.vectorizer.transform([query]).indices
+        if len(terms) == 0:
+            return []
+        scores = np.asarray(self.weights[np.unique(terms)].sum(axis=0)).ravel()
+        candidates = np.arange(len(scores)) if positions is None else positions
+        if positions is not None:
+            scores = scores[positions]
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+class SparseRetriever(BaseRetriever):
+    """
+    Keyword retriever over a SparseIndex, returning documents from the vector store's docstore.
+
+    When positions is set only those documents are searched.
+    """
+
+    sparse_index: Any
+    vector_store: Any
+    k: int = 4
+    positions: Any = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        documents = []
+        for position, _ in self.sparse_index.search(query, self.k, self.positions):
+            # BM25 columns are document rows, which the docstore is keyed by (unlike FAISS vector IDs)
+            document = self.vector_store.docstore.search(int(position))
+            if isinstance(document, Document):
+                documents.append(document)
+        return documents
@@ -0,0 +1,89 @@
+# topic_partitions.py
+import asyncio
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, List
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+class TopicPartitions:
+    """
+    Specialty partitions of a knowledge base (topics.json and the "topics" column of documents.parquet).
+
+    Texts are tagged with the same patterns the build used, and each specialty maps to the
+    sorted index positions of its documents, so searches can be restricted to them.
+    """
+
+    def __init__(self, index_path):
+        with open(os.path.join(index_path, "topics.json")) as f:
+            config = json.load(f)
+        self.general = config.get("general", "general")
+        self.patterns = {topic: re.compile(pattern, re.IGNORECASE) for topic, pattern in config["patterns"].items()}
+        topics = pq.read_table(os.path.join(index_path, "documents.parquet"), columns=["topics"]).column("topics")
+        names = pc.list_flatten(topics).to_numpy(zero_copy_only=False)
+        rows = pc.list_parent_indices(topics).to_numpy()
+        self.num_documents = len(topics)
+        self.partitions = {topic: rows[names == topic].astype(np.int64) for topic in np.unique(names)}
+
+    @staticmethod
+    def exists(index_path):
+        return os.path.exists(os.path.join(index_path, "topics.json"))
+
+    def detect(self, text, max_topics=2, min_hits=2):
+        """
+        Return the specialties a text is about, as a sorted tuple (empty when none is clear).
+
+        A specialty needs at least min_hits keyword matches; at most max_topics are returned.
+        """
+        hits = Counter({topic: len(pattern.findall(text or "")) for topic, pattern in self.patterns.items()})
+        return tuple(sorted(topic for topic, count in hits.most_common(max_topics) if count >= min_hits))
+
+    def positions(self, topics):
+        """Sorted index positions of the documents tagged with any of the topics."""
+        partitions = [self.partitions[topic] for topic in topics if topic in self.partitions]
+        if not partitions:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(partitions))
+
+class PartitionRetriever(BaseRetriever):
+    """
+    FAISS retriever restricted to some documents by a search-time selector of their vector IDs.
+
+    search_params holds the faiss.SearchParameters carrying the selector (and the nprobe or
+    efSearch of the index), so documents outside the partition are skipped inside the
+    index search instead of being fetched and filtered afterwards.
+    """
+
+    vector_store: Any
+    search_params: Any
+    k: int = 4
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _search(self, embedding):
+        query = np.asarray([embedding], dtype=np.float32)
+        _, vector_ids = self.vector_store.index.search(query, self.k, params=self.search_params)
+        documents = []
+        for vector_id in vector_ids[0]:
+            if vector_id < 0:
+                continue
+            document = self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[vector_id])
+            if isinstance(document, Document):
+                documents.append(document)
+        return documents
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self._search(self.vector_store.embedding_function.embed_query(query))
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        embedding = await self.vector_store.embedding_function.aembed_query(query)
+        # The index search and Parquet reads block, so they run off the event loop like LangChain's FAISS async path
+        return await asyncio.get_running_loop().run_in_executor(None, self._search, embedding)
@@ -0,0 +1,96 @@
+# translation_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# On-disk store shared by all workers, and size of the in-memory LRU in front of it
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "cache/translations.sqlite3")
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "2048"))
+
+class TranslationCache:
+    """
+    Content-addressed cache of translations keyed by (text, source language, target language).
+
+    Lookups hit an in-memory LRU first and fall back to a SQLite table, so translations
+    survive restarts and are shared between processes on the same host. Only fixed
+    strings (questions, greetings, closing messages) should be stored here, never
+    patient answers.
+    """
+
+    def __init__(self, path=TRANSLATION_CACHE_PATH, max_entries=TRANSLATION_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text, source_language, target_language):
+        payload = "\x1f".join([source_language.strip().lower(), target_language.strip().lower(), text])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _db(self):
+        if self._connection is None and self.path:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                connection = sqlite3.connect(self.path, check_same_thread=False)
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, translation TEXT NOT NULL)")
+                connection.commit()
+            except (OSError, sqlite3.Error) as e:
+                # An unwritable cache location disables the disk tier instead of failing translations
+                print(f"Translation cache unavailable at {self.path} ({e}); caching in memory only.")
+                self.path = None
+                return None
+            self._connection = connection
+        return self._connection
+
+    def _remember(self, key, translation):
+        self._memory[key] = translation
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, text, source_language, target_language):
+        """Return the cached translation, or None if the text has not been translated yet."""
+        key = self.make_key(text, source_language, target_language)
+        with self._lock:
+            translation = self._memory.get(key)
+            if translation is None:
+                try:
+                    db = self._db()
+                    row = db.execute("SELECT translation FROM translations WHERE key = ?", (key,)).fetchone() if db else None
+                except sqlite3.Error as e:
+                    print(f"Translation cache error: {e}")
+                    row = None
+                translation = row[0] if row else None
+            if translation is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, translation)
+            return translation
+
+    def put(self, text, source_language, target_language, translation):
+        key = self.make_key(text, source_language, target_language)
+        with self._lock:
+            self._remember(key, translation)
+            try:
+                db = self._db()
+                if db:
+                    db.execute("INSERT OR REPLACE INTO translations (key, translation) VALUES (?, ?)", (key, translation))
+                    db.commit()
+            except sqlite3.Error as e:
+                print(f"Translation cache error: {e}")
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
+
+# Process-wide translation cache
+translation_cache = TranslationCache()
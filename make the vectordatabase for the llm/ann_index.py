@@ -0,0 +1,90 @@
+# ann_index.py
+import math
+import os
+import sys
+import numpy as np
+import faiss
+
+# Index loading is shared with the app (hf/index_storage.py), so the build reads indexes as it does
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "hf"))
+from index_storage import base_index, read_index_mapped
+
+INDEX_TYPES = ["flat", "ivf", "ivfpq", "hnsw"]
+
+# Vector encodings stored in the index: full precision, or scalar-quantized to 2 or 1 bytes per value
+INDEX_ENCODINGS = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+
+def default_nlist(num_vectors):
+    """Rule of thumb for the number of IVF cells: about 4 * sqrt(N), at least 1."""
+    return max(1, min(num_vectors // 39, int(4 * math.sqrt(num_vectors))))
+
+def factory_string(index_type, num_vectors, nlist=None, pq_m=64, hnsw_m=32, encoding="float32", id_mapped=False):
+    """
+    Translate an index type and its build parameters into a faiss.index_factory string.
+
+    encoding selects how vectors are stored by the flat, IVF and HNSW indexes; IVF-PQ
+    always stores product-quantized codes. With id_mapped, flat and HNSW indexes are
+    wrapped in IDMap2 so vectors carry their own IDs; IVF indexes store IDs themselves.
+    """
+    nlist = nlist or default_nlist(num_vectors)
+    storage = INDEX_ENCODINGS[encoding]
+    prefix = "IDMap2," if id_mapped else ""
+    if index_type == "flat":
+        return f"{prefix}{storage}"
+    if index_type == "ivf":
+        return f"IVF{nlist},{storage}"
+    if index_type == "ivfpq":
+        return f"IVF{nlist},PQ{pq_m}"
+    if index_type == "hnsw":
+        return f"{prefix}HNSW{hnsw_m}" if encoding == "float32" else f"{prefix}HNSW{hnsw_m},{storage}"
+    raise ValueError(f"Unknown index type: {index_type} (choose from {', '.join(INDEX_TYPES)})")
+
+def requires_training(index_type, encoding="float32"):
+    """Whether an index learns from the vectors it is built on (IVF cells, PQ codebooks, SQ8 ranges)."""
+    return index_type in ("ivf", "ivfpq") or encoding == "int8"
+
+def supports_removal(index_type):
+    """Whether vectors can be removed from an index of this type (HNSW graphs cannot drop nodes)."""
+    return index_type != "hnsw"
+
+def add_vectors(index, embeddings, ids=None, chunk_size=65536):
+    """Add an (N, d) embedding matrix to an index in chunks, with their int64 IDs when given."""
+    for start in range(0, len(embeddings), chunk_size):
+        vectors = np.ascontiguousarray(embeddings[start:start + chunk_size], dtype=np.float32)
+        if ids is None:
+            index.add(vectors)
+        else:
+            index.add_with_ids(vectors, np.ascontiguousarray(ids[start:start + chunk_size], dtype=np.int64))
+
+def create_index(embeddings, index_type="flat", nlist=None, pq_m=64, hnsw_m=32, ef_construction=80,
+                 encoding="float32", train_size=100_000, seed=0, ids=None):
+    """
+    Build a FAISS L2 index of the given type over an (N, d) embedding matrix.
+
+    IVF variants and scalar-quantized encodings are trained on a random sample of at
+    most train_size vectors. With ids, the vectors are added under those IDs instead of
+    their positions, so they can later be removed or added to by ID.
+    """
+    num_vectors, dimension = embeddings.shape
+    description = factory_string(index_type, num_vectors, nlist, pq_m, hnsw_m, encoding, id_mapped=ids is not None)
+    index = faiss.index_factory(dimension, description, faiss.METRIC_L2)
+    if index_type == "hnsw":
+        base_index(index).hnsw.efConstruction = ef_construction
+    if not index.is_trained:
+        rows = np.random.default_rng(seed).choice(num_vectors, size=min(train_size, num_vectors), replace=False)
+        index.train(np.ascontiguousarray(embeddings[np.sort(rows)], dtype=np.float32))
+    add_vectors(index, embeddings, ids)
+    return index
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Apply query-time parameters; those that do not apply to the index type are ignored."""
+    params = faiss.ParameterSpace()
+    if nprobe is not None and faiss.try_extract_index_ivf(index) is not None:
+        params.set_index_parameter(index, "nprobe", nprobe)
+    if ef_search is not None and "HNSW" in type(base_index(index)).__name__:
+        params.set_index_parameter(index, "efSearch", ef_search)
+    return index
+
+def index_memory_bytes(index):
+    """Size of the serialized index, a close proxy for the memory it occupies."""
+    return faiss.serialize_index(index).nbytes
@@ -0,0 +1,89 @@
+"""
+Compare FAISS index types on the real dialogue embeddings.
+
+    python benchmark_index.py knowledge/faiss_index_all_documents/embeddings.npy --k 4 --queries 1000 \
+        --index-types flat ivf ivfpq hnsw --nprobe 8 32 --ef-search 32 128
+
+For every index type and query-time setting, reports recall@k against the exact flat
+index, p50/p99 single-query latency and index memory. Queries are sampled from the corpus
+and perturbed slightly, so they behave like new text close to existing dialogues.
+"""
+import argparse
+import time
+import numpy as np
+import faiss
+from ann_index import INDEX_TYPES, INDEX_ENCODINGS, create_index, set_search_params, index_memory_bytes
+from embedding_storage import load_embeddings
+
+def sample_queries(embeddings, num_queries, noise=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(embeddings), size=min(num_queries, len(embeddings)), replace=False))
+    queries = np.asarray(embeddings[rows], dtype=np.float32)
+    return queries + rng.normal(0, noise, queries.shape).astype(np.float32)
+
+def measure(index, queries, k):
+    """Search one query at a time, as the chatbot does, and return (results, latencies in ms)."""
+    results = np.empty((len(queries), k), dtype=np.int64)
+    latencies = np.empty(len(queries))
+    for row, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies[row] = (time.perf_counter() - start) * 1000
+        results[row] = ids[0]
+    return results, latencies
+
+def recall_at_k(results, ground_truth):
+    hits = sum(len(set(found) & set(expected)) for found, expected in zip(results, ground_truth))
+    return hits / ground_truth.size
+
+def search_settings(index_type, args):
+    if index_type in ("ivf", "ivfpq"):
+        return [{"nprobe": nprobe} for nprobe in args.nprobe]
+    if index_type == "hnsw":
+        return [{"ef_search": ef_search} for ef_search in args.ef_search]
+    return [{}]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types: recall@k, latency and memory.")
+    parser.add_argument("embeddings", help="Embedding matrix written by fiss.py (embeddings.npy)")
+    parser.add_argument("--k", type=int, default=4, help="Neighbours per query (the retriever default is 4)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--index-types", nargs="+", default=INDEX_TYPES, choices=INDEX_TYPES)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--pq-m", type=int, default=64)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--encodings", nargs="+", default=["float32"], choices=list(INDEX_ENCODINGS),
+                        help="Vector encodings to compare for the flat, IVF and HNSW indexes")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads during search")
+    args = parser.parse_args(argv)
+
+    embeddings = load_embeddings(args.embeddings)
+    queries = sample_queries(embeddings, args.queries)
+    faiss.omp_set_num_threads(args.threads)
+    print(f"{len(embeddings)} vectors of dimension {embeddings.shape[1]}, {len(queries)} queries, k={args.k}")
+
+    baseline = create_index(embeddings, "flat")
+    ground_truth, _ = measure(baseline, queries, args.k)
+
+    print(f"{'index':<8} {'encoding':<8} {'setting':<16} {'build s':>8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'memory MB':>10}")
+    for index_type in args.index_types:
+        for encoding in (args.encodings if index_type != "ivfpq" else ["pq"]):
+            start = time.perf_counter()
+            if index_type == "flat" and encoding == "float32":
+                index = baseline
+            else:
+                index = create_index(embeddings, index_type, nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m,
+                                     encoding="float32" if encoding == "pq" else encoding)
+            build_seconds = time.perf_counter() - start
+            memory_mb = index_memory_bytes(index) / 1024 ** 2
+            for setting in search_settings(index_type, args):
+                set_search_params(index, **setting)
+                results, latencies = measure(index, queries, args.k)
+                label = ",".join(f"{key}={value}" for key, value in setting.items()) or "exact"
+                print(f"{index_type:<8} {encoding:<8} {label:<16} {build_seconds:>8.1f} {recall_at_k(results, ground_truth):>9.3f} "
+                      f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f} {memory_mb:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Compare dialogue_ingest.py with the 2-Data.ipynb ingestion it replaces.
+
+    python benchmark_ingest.py Medical-Dialogue-System/dialogue_0.txt --workers 4
+    python benchmark_ingest.py --synthetic 20000 --shards 4
+
+Runs the notebook's split_content / create_dataframe / create / create_csv flow (ported
+below unchanged apart from taking explicit paths) and the streaming parser on the same
+shards, then reports dialogues per second for each and the share of the notebook's
+complete rows that the streaming parser reproduces. The two differ where a content line
+starts with a header word ("Doctor said ..."), which the notebook takes for a new section;
+the synthetic text avoids such lines.
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+import pandas as pd
+from dialogue_ingest import FIELDS, find_shards, ingest, parse_dialogues
+
+# --- 2-Data.ipynb port -----------------------------------------------------------------
+
+def legacy_split_content(file, work_dir):
+    subdirectory = os.path.basename(file).replace(".txt", "")
+    out_dir = os.path.join(work_dir, "data", subdirectory)
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    out_n = 0
+    done = False
+    with open(file, encoding="utf-8") as in_file:
+        while not done:
+            file_tmp = os.path.join(out_dir, f"out{out_n}.txt")
+            with open(file_tmp, "w", encoding="utf-8") as out_file:
+                while not done:
+                    try:
+                        line = next(in_file).strip()
+                    except StopIteration:
+                        done = True
+                        break
+                    if "id=" in line:
+                        break
+                    out_file.write(line + '\n')
+                out_n += 1
+    res = []
+    for (dir_path, dir_names, file_names) in os.walk(out_dir):
+        res.extend(file_names)
+    return out_dir, res
+
+def legacy_create_dataframe(text_as_string, name_partial):
+    string = re.sub(r'http://\S+|https://\S+', '', text_as_string)
+    keywords = {'Description', 'Dialogue', 'Patient:', 'Doctor:'}
+    text = re.split(r'\n(?=Description|Dialogue|Patient|Doctor)', string)
+    updated_dic = {}
+    for segment in text:
+        for word in keywords:
+            if re.search(word, segment) is not None:
+                try:
+                    command, content = segment.strip().split(None, 1)
+                    command = command.replace(":", "")
+                    content = content.strip().replace("\n", " ")
+                    updated_dic.update({command: content})
+                except ValueError:
+                    pass
+    return pd.DataFrame(updated_dic, index=[name_partial])
+
+def legacy_create(file, work_dir):
+    out_dir, res = legacy_split_content(file, work_dir)
+    df = pd.DataFrame()
+    for partial in res:
+        text_as_string = open(os.path.join(out_dir, partial), encoding="utf-8").read()
+        df = pd.concat([df, legacy_create_dataframe(text_as_string, partial)])
+    return df
+
+def legacy_create_csv(file, work_dir):
+    dfa = legacy_create(file, work_dir).reset_index(names="Filename")
+    out_dir = os.path.join(work_dir, "data", "csv")
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    out_file = os.path.join(out_dir, os.path.basename(file).replace(".txt", ".csv"))
+    dfa.to_csv(out_file, sep='\t', encoding='utf-8', index=False)
+    return pd.read_csv(out_file, sep='\t')
+
+# ----------------------------------------------------------------------------------------
+
+def write_synthetic_shards(directory, dialogues, shards, seed=0):
+    """Write shards in the MedDialog layout, with multi-line turns and links, for offline runs."""
+    rng = random.Random(seed)
+    words = ("pain fever headache chest cough dose tablet blood pressure sugar back knee "
+             "allergy rash sleep anxiety stomach infection test report weeks").split()
+    sentence = lambda n: " ".join(rng.choice(words) for _ in range(n)).capitalize() + "."
+    paths = []
+    for shard in range(shards):
+        path = os.path.join(directory, f"dialogue_{shard}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for dialogue_id in range(shard, dialogues, shards):
+                f.write(f"id={dialogue_id}\nhttps://www.healthcaremagic.com/questions/{dialogue_id}\n")
+                f.write(f"Description\nQ. {sentence(8)}\nDialogue\n")
+                f.write(f"Patient:\n{sentence(30)}\n{sentence(20)}\n")
+                f.write(f"Doctor:\n{sentence(40)} See https://example.com/{dialogue_id} for details.\n{sentence(25)}\n\n")
+        paths.append(path)
+    return paths
+
+def _normalize(values):
+    return tuple(" ".join(str(value).split()) for value in values)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the streaming dialogue parser against the notebook version.")
+    parser.add_argument("inputs", nargs="*", help="Shard files or directories containing dialogue_*.txt")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many synthetic dialogues instead")
+    parser.add_argument("--shards", type=int, default=4, help="Number of synthetic shards")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for the parallel run")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the streaming parser")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="ingest-benchmark-")
+    try:
+        shards = write_synthetic_shards(work_dir, args.synthetic, args.shards) if args.synthetic else find_shards(args.inputs)
+        if not shards:
+            parser.error("give shard files or directories, or --synthetic N")
+
+        start = time.perf_counter()
+        streamed = []
+        for shard in shards:
+            with open(shard, encoding="utf-8") as lines:
+                streamed.extend(parse_dialogues(lines))
+        single = time.perf_counter() - start
+        print(f"streaming parser, 1 process: {len(streamed)} dialogues in {single:.2f}s "
+              f"({len(streamed) / single:.0f} dialogues/s)")
+
+        start = time.perf_counter()
+        written, _ = ingest(shards, os.path.join(work_dir, "parquet"), args.workers)
+        parallel = time.perf_counter() - start
+        print(f"dialogue_ingest to Parquet, {args.workers or os.cpu_count()} workers: {written} dialogues in "
+              f"{parallel:.2f}s ({written / parallel:.0f} dialogues/s)")
+
+        if args.skip_legacy:
+            return
+        start = time.perf_counter()
+        frames = [legacy_create_csv(shard, os.path.join(work_dir, "legacy")) for shard in shards]
+        legacy = pd.concat(frames, ignore_index=True)
+        legacy = legacy[legacy[FIELDS].notnull().all(axis=1)] if set(FIELDS) <= set(legacy.columns) else legacy.iloc[0:0]
+        legacy_seconds = time.perf_counter() - start
+        print(f"2-Data.ipynb flow, 1 process: {len(legacy)} complete dialogues in {legacy_seconds:.2f}s "
+              f"({len(legacy) / legacy_seconds:.0f} dialogues/s)")
+        print(f"speed-up: {legacy_seconds / single:.1f}x single process, {legacy_seconds / parallel:.1f}x parallel")
+
+        expected = {_normalize(row) for row in legacy[FIELDS].itertuples(index=False)}
+        produced = {_normalize(record[field] for field in FIELDS) for record in streamed}
+        if expected:
+            print(f"agreement: {len(expected & produced) / len(expected):.1%} of the notebook's rows reproduced exactly")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Parse the raw MedDialog dialogue_*.txt shards straight into Parquet.
+
+    python dialogue_ingest.py Medical-Dialogue-System --output-dir data/parquet/dialogues --workers 5
+
+Each shard is read once, line by line, by a streaming parser and written by its own
+worker process to <output-dir>/part-<shard>.parquet in row groups, with the columns
+source, dialogue_id, Question, Patient, Answer and combined (the text fiss.py
+embeds), named and labelled like the dialogues of the existing knowledge base. The output directory reads as one table with pandas or pyarrow, and fiss.py
+accepts it as input. This replaces the split_content / create_dataframe / merge flow of
+2-Data.ipynb and its per-dialogue files and CSV round trips; benchmark_ingest.py
+compares the two.
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from multiprocessing import Pool
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+# Classifies every line of a shard in one match: record start, section header, bare URL, or (no match) content
+_LINE = re.compile(r"^(?:id=(?P<id>\d+)|(?P<section>Description|Dialogue|Patient:|Doctor:)|(?P<url>https?://\S+))\s*$")
+# Links inside content lines, removed as the notebook did
+_URL = re.compile(r"https?://\S+")
+
+FIELDS = ["Description", "Patient", "Doctor"]
+# Output column of each shard section, as in dialogues_embededd.pkl and the knowledge base built from it
+COLUMNS = {"Description": "Question", "Patient": "Patient", "Doctor": "Answer"}
+
+SCHEMA = pa.schema([
+    ("source", pa.string()),
+    ("dialogue_id", pa.int64()),
+    ("Question", pa.string()),
+    ("Patient", pa.string()),
+    ("Answer", pa.string()),
+    ("combined", pa.string()),
+])
+
+ROW_GROUP_SIZE = 10_000
+
+def _record(dialogue_id, sections, stats):
+    if dialogue_id is None:
+        return None
+    if any(not sections.get(field) for field in FIELDS):
+        stats["skipped"] += 1
+        return None
+    record = {field: sections[field] for field in FIELDS}
+    record["dialogue_id"] = dialogue_id
+    return record
+
+def parse_dialogues(lines, stats=None):
+    """
+    Yield one dict per dialogue (dialogue_id, Description, Patient, Doctor) from the lines of a shard.
+
+    Content lines are joined with spaces. As in the notebook, when a speaker talks more
+    than once the last turn is kept. Dialogues missing a field are skipped and counted
+    in stats["skipped"].
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("skipped", 0)
+    dialogue_id, sections, section, content = None, {}, None, []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        match = _LINE.match(line)
+        if match is None:
+            if section is not None:
+                if "http" in line:
+                    line = _URL.sub("", line).strip()
+                if line:
+                    content.append(line)
+            continue
+        kind = match.lastgroup
+        if kind == "url":
+            continue
+        if section is not None and content:
+            sections[section] = " ".join(content)
+        section, content = None, []
+        if kind == "id":
+            record = _record(dialogue_id, sections, stats)
+            if record is not None:
+                yield record
+            dialogue_id, sections = int(match.group("id")), {}
+        else:
+            name = match.group("section").rstrip(":")
+            # "Dialogue" only introduces the turns that follow
+            section = name if name in FIELDS else None
+    if section is not None and content:
+        sections[section] = " ".join(content)
+    record = _record(dialogue_id, sections, stats)
+    if record is not None:
+        yield record
+
+def combine(question, patient, answer):
+    """The single text per dialogue that is embedded and retrieved."""
+    return f"Question: {question}; Patient: {patient}; Answer: {answer}"
+
+def _batch(source, records):
+    columns = {field: [record[field] for record in records] for field in FIELDS}
+    return pa.record_batch([
+        pa.array([source] * len(records), pa.string()),
+        pa.array([record["dialogue_id"] for record in records], pa.int64()),
+        pa.array(columns["Description"], pa.string()),
+        pa.array(columns["Patient"], pa.string()),
+        pa.array(columns["Doctor"], pa.string()),
+        pa.array([combine(*values) for values in zip(*(columns[field] for field in FIELDS))], pa.string()),
+    ], schema=SCHEMA)
+
+def ingest_shard(path, output_dir, row_group_size=ROW_GROUP_SIZE):
+    """
+    Parse one shard and write it to <output_dir>/part-<shard>.parquet, one row group at a time.
+
+    Returns:
+        tuple: (path, dialogues written, dialogues skipped)
+    """
+    source = os.path.splitext(os.path.basename(path))[0]
+    output_path = os.path.join(output_dir, f"part-{source}.parquet")
+    temp_path = f"{output_path}.tmp"
+    stats = {}
+    written = 0
+    with open(path, encoding="utf-8") as lines, \
+            pq.ParquetWriter(temp_path, SCHEMA, compression="zstd") as writer:
+        records = []
+        for record in parse_dialogues(lines, stats):
+            records.append(record)
+            if len(records) == row_group_size:
+                writer.write_batch(_batch(source, records), row_group_size=row_group_size)
+                written += len(records)
+                records = []
+        if records:
+            writer.write_batch(_batch(source, records), row_group_size=row_group_size)
+            written += len(records)
+    os.replace(temp_path, output_path)
+    return path, written, stats["skipped"]
+
+def _ingest_shard(args):
+    return ingest_shard(*args)
+
+def find_shards(inputs):
+    """Expand input files and directories (searched for dialogue_*.txt) into a sorted list of shards."""
+    shards = []
+    for path in inputs:
+        if os.path.isdir(path):
+            shards.extend(glob.glob(os.path.join(path, "dialogue_*.txt")))
+        else:
+            shards.append(path)
+    return sorted(shards)
+
+def ingest(shards, output_dir, workers=None, row_group_size=ROW_GROUP_SIZE):
+    """
+    Parse shards in parallel worker processes into a directory of Parquet part files.
+
+    Returns:
+        tuple: (dialogues written, dialogues skipped)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(shards)))
+    jobs = [(shard, output_dir, row_group_size) for shard in shards]
+    written = skipped = 0
+    with Pool(workers) as pool:
+        for path, shard_written, shard_skipped in tqdm(pool.imap_unordered(_ingest_shard, jobs),
+                                                       total=len(jobs), desc="Parsing shards", unit="shard"):
+            written += shard_written
+            skipped += shard_skipped
+    return written, skipped
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Parse MedDialog dialogue_*.txt shards into Parquet.")
+    parser.add_argument("inputs", nargs="+", help="Shard files, or directories containing dialogue_*.txt")
+    parser.add_argument("--output-dir", default=os.path.join("data", "parquet", "dialogues"),
+                        help="Directory receiving one part-<shard>.parquet per shard")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE, help="Dialogues per Parquet row group")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    shards = find_shards(args.inputs)
+    if not shards:
+        raise ValueError(f"No dialogue shards found in {', '.join(args.inputs)}")
+    start = time.perf_counter()
+    written, skipped = ingest(shards, args.output_dir, args.workers, args.row_group_size)
+    elapsed = time.perf_counter() - start
+    print(f"{written} dialogues from {len(shards)} shards written to '{args.output_dir}' in {elapsed:.1f}s "
+          f"({written / max(elapsed, 1e-9):.0f} dialogues/s); {skipped} incomplete dialogues skipped.")
+
+if __name__ == "__main__":
+    main()
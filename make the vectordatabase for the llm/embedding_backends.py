@@ -0,0 +1,92 @@
+# embedding_backends.py
+import hashlib
+import random
+import re
+import time
+import numpy as np
+
+# Output sizes of the OpenAI embedding models we use
+OPENAI_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+class OpenAIBackend:
+    """Embeds batches of texts with the OpenAI embeddings endpoint."""
+
+    name = "openai"
+
+    def __init__(self, model="text-embedding-ada-002", api_key=None):
+        from openai import OpenAI
+
+        self.model = model
+        # Retries are handled by embed_with_retry so they can back off across threads
+        self.client = OpenAI(api_key=api_key, max_retries=0)
+        self._dimension = OPENAI_DIMENSIONS.get(model)
+
+    @property
+    def dimension(self):
+        if self._dimension is None:
+            self._dimension = len(self.embed(["dimension probe"])[0])
+        return self._dimension
+
+    def embed(self, texts):
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        return np.array([item.embedding for item in sorted(response.data, key=lambda item: item.index)], dtype=np.float32)
+
+    @staticmethod
+    def is_retryable(error):
+        import openai
+
+        return isinstance(error, (openai.RateLimitError, openai.APIConnectionError,
+                                  openai.APITimeoutError, openai.InternalServerError))
+
+class HashBackend:
+    """
+    Deterministic local stand-in for an embedding model.
+
+    Tokens are hashed into a fixed number of buckets (feature hashing) and the vector is
+    L2-normalized, so texts sharing words end up close together. It needs no network
+    access, which makes index builds reproducible and testable offline.
+    """
+
+    name = "hash"
+
+    def __init__(self, model="hash", dimension=1536):
+        self.model = model
+        self.dimension = dimension
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vectors[row, value % self.dimension] += 1.0 if (value >> 63) else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    @staticmethod
+    def is_retryable(error):
+        return False
+
+def load_backend(name, model=None, api_key=None):
+    """Create an embedding backend by name ('openai' or 'hash')."""
+    if name == "openai":
+        return OpenAIBackend(model or "text-embedding-ada-002", api_key)
+    if name == "hash":
+        return HashBackend()
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+def embed_with_retry(backend, texts, max_retries=8, base_delay=1.0, max_delay=60.0):
+    """Embed a batch, backing off exponentially with jitter on rate limits and transient errors."""
+    for attempt in range(max_retries + 1):
+        try:
+            return backend.embed(texts)
+        except Exception as error:
+            if attempt == max_retries or not backend.is_retryable(error):
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"Embedding request failed ({error.__class__.__name__}), retrying in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,40 @@
+# embedding_storage.py
+import os
+import sys
+import numpy as np
+
+# Reading embeddings back is shared with the app (hf/index_storage.py), which memory-maps them for MMR
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "hf"))
+from index_storage import load_embeddings, scale_path
+
+EMBEDDING_DTYPES = ["float32", "float16", "int8"]
+
+def save_embeddings(path, embeddings, dtype="float32", chunk_size=65536):
+    """
+    Write an (N, d) float32 matrix to path as float32, float16 or int8 (scalar quantized).
+
+    The matrix is converted in chunks so it can be a memory map larger than RAM.
+    """
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unknown embedding dtype: {dtype}")
+    temp_path = f"{path}.tmp.npy"
+    if dtype == "int8":
+        low = np.full(embeddings.shape[1], np.inf, dtype=np.float32)
+        high = np.full(embeddings.shape[1], -np.inf, dtype=np.float32)
+        for start in range(0, len(embeddings), chunk_size):
+            chunk = np.asarray(embeddings[start:start + chunk_size], dtype=np.float32)
+            low = np.minimum(low, chunk.min(axis=0))
+            high = np.maximum(high, chunk.max(axis=0))
+        scale = np.maximum(high - low, 1e-12) / 255
+        np.save(scale_path(path), np.stack([low, scale]))
+    output = np.lib.format.open_memmap(temp_path, mode="w+", dtype=np.dtype(dtype), shape=embeddings.shape)
+    for start in range(0, len(embeddings), chunk_size):
+        chunk = np.asarray(embeddings[start:start + chunk_size], dtype=np.float32)
+        if dtype == "int8":
+            chunk = np.clip(np.rint((chunk - low) / scale) - 128, -128, 127)
+        output[start:start + len(chunk)] = chunk.astype(dtype)
+    output.flush()
+    del output
+    os.replace(temp_path, path)
+    if dtype != "int8" and os.path.exists(scale_path(path)):
+        os.remove(scale_path(path))
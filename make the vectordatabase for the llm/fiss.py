@@ -1,65 +1,404 @@
+"""
+Build the knowledge base used by the chatbot (see kb_format.py for the on-disk format).
+
+    python fiss.py data/parquet/dialogues --output-dir knowledge
+
+Texts are embedded in batches by a pool of worker threads. Embeddings are appended to a
+memory-mapped scratch file and completed batches are checkpointed, so an interrupted run
+picks up where it stopped when started again with the same arguments. The embeddings,
+ANN index, documents with their metadata and BM25 index are then written to
+knowledge/faiss_index_all_documents together with a versioned manifest.json.
+
+    python fiss.py new_dialogues.parquet --incremental [--delete-missing]
+
+updates an existing knowledge base: documents are identified by a hash of their content,
+so only texts it does not contain yet are embedded. Their vectors are added to the stored
+index under new vector IDs and, with --delete-missing, the vectors of documents no
+longer present in the input are removed by ID. The index is rebuilt from the stored
+embeddings only when needed: HNSW graphs cannot remove vectors, and a trained index
+(IVF cells, quantizer ranges) is retrained once the documents changed since its training
+exceed --retrain-after times the ones it was trained on, or with --retrain.
+
+Near-duplicate dialogues (estimated Jaccard similarity of their word 3-shingles at or above
+--dedup-threshold) are collapsed into the first of them before embedding, and every
+collapsed row is listed in <output-dir>/near_duplicates.csv.
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
+import pyarrow.parquet as pq
+import faiss
 from dotenv import load_dotenv
-from tqdm import tqdm  
-import faiss  
-import os
+from tqdm import tqdm
+from embedding_backends import load_backend, embed_with_retry
+from ann_index import INDEX_TYPES, INDEX_ENCODINGS, add_vectors, create_index, requires_training, supports_removal
+from embedding_storage import EMBEDDING_DTYPES, save_embeddings, load_embeddings
+from sparse_index import write_sparse_index
+from topics import tag_topics, write_topics
+from near_duplicates import DEFAULT_THRESHOLD, find_near_duplicates, write_report
+from kb_format import (KB_FORMAT_VERSION, EMBEDDINGS, INDEX, write_documents, read_documents,
+                       read_manifest, write_manifest, staged_directory)
+
+NEAR_DUPLICATES_REPORT = "near_duplicates.csv"
+
+# Manifest index fields tracking how stale the training of IVF and SQ8 indexes is
+# (trained_documents is None for indexes that learn nothing from the data)
+TRAINING_FIELDS = ("trained_documents", "changed_since_training")
+
+# Input columns copied into documents.parquet as metadata when present
+METADATA_COLUMNS = ["source", "dialogue_id", "Description", "Question"]
+
+def _input_columns(input_path):
+    if input_path.endswith(".parquet") or os.path.isdir(input_path):
+        return pq.ParquetDataset(input_path).schema.names
+    if input_path.endswith((".csv", ".tsv")):
+        return pd.read_csv(input_path, sep="\t", encoding="utf-8", nrows=0).columns.tolist()
+    return None
+
+def read_dataset(input_path, column="combined", metadata_columns=METADATA_COLUMNS):
+    """
+    Read the texts to embed, and the metadata columns present, from a pandas pickle, a
+    Parquet file or directory, or a tab-separated CSV file.
+
+    Returns:
+        tuple: (texts, {column: values})
+    """
+    available = _input_columns(input_path)
+    if available is not None:
+        metadata_columns = [name for name in metadata_columns if name in available and name != column]
+        columns = [column] + metadata_columns
+        if input_path.endswith((".csv", ".tsv")):
+            data = pd.read_csv(input_path, sep="\t", encoding="utf-8", usecols=columns)
+        else:
+            data = pd.read_parquet(input_path, columns=columns)
+    else:
+        data = pd.read_pickle(input_path)
+        metadata_columns = [name for name in metadata_columns if name in data.columns and name != column]
+    texts = data[column].fillna("").astype(str).tolist()
+    metadata = {name: data[name].where(data[name].notnull(), None).tolist() for name in metadata_columns}
+    return texts, metadata
+
+def content_id(text):
+    """Stable document ID derived from the document's content."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+def unique_texts(texts):
+    """Drop exact duplicates, keeping the first occurrence, and return (ids, texts, input rows)."""
+    seen = {}
+    for row, text in enumerate(texts):
+        seen.setdefault(content_id(text), row)
+    rows = list(seen.values())
+    return list(seen.keys()), [texts[row] for row in rows], rows
+
+def drop_near_duplicates(ids, texts, rows, threshold, report_path):
+    """
+    Keep the first text of every group of near-duplicates and report the collapsed ones.
+
+    Returns:
+        tuple: (ids, texts, input rows) of the kept texts, and a summary for the manifest
+    """
+    representatives, similarity = find_near_duplicates(texts, threshold)
+    collapsed = representatives != np.arange(len(texts))
+    write_report(report_path, ids, texts, representatives, similarity)
+    keep = np.flatnonzero(~collapsed)
+    print(f"Near-duplicates (similarity >= {threshold}): collapsed {int(collapsed.sum())} of {len(texts)} documents "
+          f"into {len(np.unique(representatives[collapsed]))} kept ones; see '{report_path}'.")
+    summary = {"threshold": threshold, "collapsed": int(collapsed.sum())}
+    return [ids[row] for row in keep], [texts[row] for row in keep], [rows[row] for row in keep], summary
+
+def _load_progress(progress_path, expected):
+    if not os.path.exists(progress_path):
+        return None
+    with open(progress_path) as f:
+        progress = json.load(f)
+    for key, value in expected.items():
+        if progress.get(key) != value:
+            print(f"Checkpoint does not match this run ({key} changed), starting over.")
+            return None
+    return progress
+
+def _save_progress(progress_path, progress):
+    temp_path = f"{progress_path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(progress, f)
+    os.replace(temp_path, progress_path)
+
+def _texts_digest(texts):
+    """Digest of the ordered texts, so a checkpoint is only resumed for the same input."""
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(content_id(text).encode("ascii"))
+    return digest.hexdigest()
+
+def embed_texts(texts, backend, embeddings_path, batch_size=256, workers=4):
+    """
+    Embed texts into a memory-mapped .npy file, resuming from its checkpoint if present.
+
+    Returns:
+        np.memmap: The (len(texts), dimension) float32 embedding matrix
+    """
+    progress_path = f"{embeddings_path}.progress.json"
+    num_batches = (len(texts) + batch_size - 1) // batch_size
+    expected = {"rows": len(texts), "texts": _texts_digest(texts), "batch_size": batch_size,
+                "backend": backend.name, "model": backend.model, "dimension": backend.dimension}
+
+    progress = _load_progress(progress_path, expected) if os.path.exists(embeddings_path) else None
+    if progress is None:
+        embeddings = np.lib.format.open_memmap(embeddings_path, mode="w+", dtype=np.float32,
+                                               shape=(len(texts), backend.dimension))
+        progress = dict(expected, done=[])
+        _save_progress(progress_path, progress)
+    else:
+        embeddings = np.lib.format.open_memmap(embeddings_path, mode="r+")
+        print(f"Resuming: {len(progress['done'])}/{num_batches} batches already embedded.")
+
+    done = set(progress["done"])
+    pending = [batch for batch in range(num_batches) if batch not in done]
+
+    def run(batch):
+        start = batch * batch_size
+        vectors = embed_with_retry(backend, texts[start:start + batch_size])
+        embeddings[start:start + len(vectors)] = vectors
+        return batch
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            tqdm(total=num_batches, initial=len(done), desc="Embedding batches", unit="batch") as bar:
+        futures = [executor.submit(run, batch) for batch in pending]
+        for future in as_completed(futures):
+            done.add(future.result())
+            # Checkpoint only after the rows are flushed, so a crash never marks lost work as done
+            embeddings.flush()
+            progress["done"] = sorted(done)
+            _save_progress(progress_path, progress)
+            bar.update(1)
+
+    os.remove(progress_path)
+    return embeddings
+
+def write_knowledge_base(kb_path, ids, texts, metadata, embeddings, embeddings_path, backend, source,
+                         index_params, embeddings_dtype="float32", vector_ids=None, index=None, **manifest_fields):
+    """
+    Write a complete knowledge base version from documents and their embeddings.
+
+    embeddings is the float32 matrix memory-mapped from embeddings_path, which is moved
+    into the knowledge base (or converted, for float16/int8 storage) and must not be
+    used afterwards. vector_ids default to 0..N-1. An updated index can be passed in;
+    otherwise one is built (and trained) over all embeddings.
+    """
+    previous = read_manifest(kb_path)
+    vector_ids = np.arange(len(texts), dtype=np.int64) if vector_ids is None else vector_ids
+    index_params = dict(index_params)
+    index_type = index_params.pop("type", "flat")
+    training = {field: index_params.pop(field, None) for field in TRAINING_FIELDS}
+    if index is None:
+        print(f"Creating {index_type} FAISS index over {len(texts)} documents...")
+        index = create_index(embeddings, index_type, ids=vector_ids, **index_params)
+        trained = requires_training(index_type, index_params.get("encoding", "float32"))
+        training = {"trained_documents": len(texts) if trained else None, "changed_since_training": 0}
+    with staged_directory(kb_path) as stage:
+        faiss.write_index(index, os.path.join(stage, INDEX))
+        print("Creating BM25 index...")
+        write_sparse_index(stage, texts)
+        # Specialties are tagged from the question title (Description, or Question in older inputs),
+        # or the whole text when the input has neither
+        titles = [[None] * len(texts) if metadata.get(name) is None else metadata[name] for name in ("Description", "Question")]
+        tags = tag_topics([description or question or text for description, question, text in zip(*titles, texts)])
+        write_documents(stage, ids, vector_ids, texts, dict(metadata, topics=tags))
+        topics = write_topics(stage, tags)
+        print(f"Tagged specialties: {', '.join(f'{topic} {count}' for topic, count in topics['documents'].items())}")
+        if embeddings_dtype == "float32":
+            embeddings.flush()
+            os.replace(embeddings_path, os.path.join(stage, EMBEDDINGS))
+        else:
+            save_embeddings(os.path.join(stage, EMBEDDINGS), embeddings, embeddings_dtype)
+            os.remove(embeddings_path)
+        manifest = write_manifest(stage, backend, len(texts), source, previous,
+                                  index=dict(index_params, type=index_type, **training),
+                                  embeddings_dtype=embeddings_dtype, **manifest_fields)
+    return manifest
+
+def _rebuild_reason(manifest, deleted, added, retrain_after, retrain=False):
+    """Why the stored index cannot be updated in place, or None when it can."""
+    index_params = manifest.get("index", {})
+    if manifest["format_version"] < 2:
+        return "it predates vector IDs"
+    if retrain:
+        return "--retrain was given"
+    if deleted and not supports_removal(index_params.get("type", "flat")):
+        return f"{index_params['type']} indexes cannot remove vectors"
+    trained = index_params.get("trained_documents")
+    changed = (index_params.get("changed_since_training") or 0) + added + deleted
+    if trained is not None and changed > retrain_after * trained:
+        return f"{changed} documents changed since it was trained on {trained}"
+    return None
+
+def update_knowledge_base(ids, texts, metadata, backend, output_dir, kb_path, args, near_duplicates=None,
+                          input_ids=None):
+    """
+    Add documents not yet in the knowledge base, and optionally delete the ones missing from the input.
+
+    Only new documents are embedded, and new documents that are near-duplicates of kept
+    ones are skipped. The index is updated in place: deleted documents' vectors are
+    removed by ID and new ones added under fresh IDs. It is rebuilt from the stored
+    embeddings instead when its type cannot remove vectors or its training is stale,
+    i.e. more than --retrain-after times the documents it was trained on have changed.
+
+    With --delete-missing, indexed documents whose IDs are not in input_ids (every input
+    text before near-duplicate collapsing, default ids) are deleted, so a document is
+    kept when the input only holds a near-duplicate of it.
+    """
+    manifest = read_manifest(kb_path)
+    if not manifest or "format_version" not in manifest:
+        raise ValueError("The knowledge base predates the versioned format; rebuild it once without --incremental.")
+    if manifest["format_version"] > KB_FORMAT_VERSION:
+        raise ValueError(f"The knowledge base uses format version {manifest['format_version']}, newer than this script.")
+    if (manifest["embedding_backend"], manifest["embedding_model"]) != (backend.name, backend.model):
+        raise ValueError(f"The index was built with {manifest['embedding_backend']}/{manifest['embedding_model']}; "
+                         f"rebuild it instead of updating with {backend.name}/{backend.model}.")
+
+    documents = read_documents(kb_path)
+    existing_ids = documents.column("id").to_pylist()
+    if "vector_id" in documents.column_names:
+        existing_vector_ids = documents.column("vector_id").to_numpy()
+    else:
+        existing_vector_ids = np.arange(len(existing_ids), dtype=np.int64)
+    existing = set(existing_ids)
+    input_ids = set(ids if input_ids is None else input_ids)
+    kept = [row for row, doc_id in enumerate(existing_ids) if not args.delete_missing or doc_id in input_ids]
+    new = [row for row, doc_id in enumerate(ids) if doc_id not in existing]
+    deleted = len(existing_ids) - len(kept)
+    kept_texts = documents.column("text").take(kept).to_pylist()
+    if new and near_duplicates:
+        representatives, _ = find_near_duplicates(kept_texts + [texts[row] for row in new], near_duplicates["threshold"])
+        unique_new = [row for offset, row in enumerate(new, len(kept)) if representatives[offset] == offset]
+        print(f"{len(new) - len(unique_new)} new documents are near-duplicates of indexed ones and are skipped.")
+        near_duplicates = dict(near_duplicates, collapsed=near_duplicates["collapsed"] + len(new) - len(unique_new))
+        new = unique_new
+    print(f"{len(existing_ids)} documents indexed, {len(new)} new, {deleted} deleted.")
+
+    new_vectors = None
+    scratch_path = os.path.join(output_dir, "embeddings.incremental.npy")
+    if new:
+        new_vectors = embed_texts([texts[row] for row in new], backend, scratch_path, args.batch_size, args.workers)
+
+    # New documents get IDs after every ID ever used, so rows stay sorted by vector_id
+    next_vector_id = int(existing_vector_ids.max()) + 1 if len(existing_vector_ids) else 0
+    new_vector_ids = np.arange(next_vector_id, next_vector_id + len(new), dtype=np.int64)
+    merged_vector_ids = np.concatenate([existing_vector_ids[kept], new_vector_ids])
+
+    index_params = dict(manifest.get("index", {"type": "flat"}))
+    reason = _rebuild_reason(manifest, deleted, len(new), args.retrain_after, args.retrain)
+    index = None
+    if reason:
+        print(f"Rebuilding the index: {reason}.")
+    else:
+        index = faiss.read_index(os.path.join(kb_path, INDEX))
+        if deleted:
+            removed_ids = np.setdiff1d(existing_vector_ids, merged_vector_ids)
+            index.remove_ids(faiss.IDSelectorBatch(removed_ids))
+        if new:
+            add_vectors(index, new_vectors, new_vector_ids)
+        index_params["changed_since_training"] = (index_params.get("changed_since_training") or 0) + len(new) + deleted
+        print(f"Updated the {index_params.get('type', 'flat')} index in place: {index.ntotal} vectors.")
+
+    # Kept rows first, in their current order, then the new documents
+    merged_path = os.path.join(output_dir, "embeddings.merged.npy")
+    stored = load_embeddings(os.path.join(kb_path, EMBEDDINGS))
+    merged = np.lib.format.open_memmap(merged_path, mode="w+", dtype=np.float32, shape=(len(kept) + len(new), backend.dimension))
+    for start in range(0, len(kept), 65536):
+        rows = np.asarray(kept[start:start + 65536], dtype=np.int64)
+        merged[start:start + len(rows)] = stored[rows]
+    if new:
+        merged[len(kept):] = new_vectors
+        del new_vectors
+        os.remove(scratch_path)
+    del stored
+
+    merged_ids = [existing_ids[row] for row in kept] + [ids[row] for row in new]
+    merged_texts = kept_texts + [texts[row] for row in new]
+    merged_metadata = {}
+    for name in [name for name in documents.column_names if name not in ("id", "vector_id", "text")] + list(metadata):
+        if name in merged_metadata:
+            continue
+        old_values = documents.column(name).take(kept).to_pylist() if name in documents.column_names else [None] * len(kept)
+        new_values = [metadata[name][row] for row in new] if name in metadata else [None] * len(new)
+        merged_metadata[name] = old_values + new_values
+
+    return write_knowledge_base(kb_path, merged_ids, merged_texts, merged_metadata, merged, merged_path, backend,
+                                args.input, index_params, manifest.get("embeddings_dtype", "float32"),
+                                merged_vector_ids, index, added=len(new), deleted=deleted, near_duplicates=near_duplicates)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the knowledge base (FAISS index and documents) for the medical chatbot.")
+    parser.add_argument("input", help="Dialogue dataset (.pkl pandas pickle, .parquet file or directory, or tab-separated .csv)")
+    parser.add_argument("--column", default="combined", help="Column holding the text to embed")
+    parser.add_argument("--output-dir", default="knowledge", help="Where the knowledge base directory is written")
+    parser.add_argument("--backend", default="openai", choices=["openai", "hash"],
+                        help="Embedding backend; 'hash' is a deterministic offline stand-in")
+    parser.add_argument("--model", default="text-embedding-ada-002", help="Embedding model for the openai backend")
+    parser.add_argument("--batch-size", type=int, default=256, help="Texts per embedding request")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent embedding requests")
+    parser.add_argument("--index-type", default="flat", choices=INDEX_TYPES,
+                        help="FAISS index: exact flat scan, or approximate IVF-Flat, IVF-PQ or HNSW")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF cells (default: about 4*sqrt(N))")
+    parser.add_argument("--pq-m", type=int, default=64, help="IVF-PQ sub-quantizers (must divide the dimension)")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW neighbours per node")
+    parser.add_argument("--ef-construction", type=int, default=80, help="HNSW build-time search depth")
+    parser.add_argument("--embeddings-dtype", default="float32", choices=EMBEDDING_DTYPES,
+                        help="Storage type of embeddings.npy: float32, float16, or int8 scalar quantized")
+    parser.add_argument("--index-encoding", default="float32", choices=list(INDEX_ENCODINGS),
+                        help="How the flat/IVF/HNSW index stores vectors: float32, float16 or int8 (SQ8)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Update the existing knowledge base, embedding only documents it does not contain yet")
+    parser.add_argument("--delete-missing", action="store_true",
+                        help="With --incremental, remove indexed documents that are not in the input")
+    parser.add_argument("--retrain-after", type=float, default=1.0,
+                        help="With --incremental, rebuild and retrain the index once the documents added and deleted "
+                             "since its training exceed this multiple of the documents it was trained on")
+    parser.add_argument("--retrain", action="store_true", help="With --incremental, always rebuild and retrain the index")
+    parser.add_argument("--dedup-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Collapse documents whose estimated shingle similarity reaches this value (0 disables)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if args.backend == "openai" and not api_key:
+        raise ValueError("Please set the OPENAI_API_KEY environment variable in a .env file or your environment.")
+
+    print(f"Reading texts from {args.input}...")
+    texts, metadata = read_dataset(args.input, args.column)
+    ids, texts, rows = unique_texts(texts)
+    input_ids = ids
+    os.makedirs(args.output_dir, exist_ok=True)
+    near_duplicates = None
+    if args.dedup_threshold > 0:
+        ids, texts, rows, near_duplicates = drop_near_duplicates(
+            ids, texts, rows, args.dedup_threshold, os.path.join(args.output_dir, NEAR_DUPLICATES_REPORT))
+    metadata = {name: [values[row] for row in rows] for name, values in metadata.items()}
+    backend = load_backend(args.backend, args.model, api_key)
+
+    kb_path = os.path.join(args.output_dir, "faiss_index_all_documents")
+    if args.incremental:
+        manifest = update_knowledge_base(ids, texts, metadata, backend, args.output_dir, kb_path, args, near_duplicates,
+                                         input_ids)
+        print(f"Knowledge base updated to corpus version {manifest['corpus_version']} ({manifest['documents']} documents).")
+        return
+
+    embeddings_path = os.path.join(args.output_dir, "embeddings.partial.npy")
+    print(f"Embedding {len(texts)} texts with {backend.name}/{backend.model}...")
+    embeddings = embed_texts(texts, backend, embeddings_path, args.batch_size, args.workers)
+
+    index_params = {"type": args.index_type, "nlist": args.nlist, "pq_m": args.pq_m, "hnsw_m": args.hnsw_m,
+                    "ef_construction": args.ef_construction, "encoding": args.index_encoding}
+    write_knowledge_base(kb_path, ids, texts, metadata, embeddings, embeddings_path, backend, args.input,
+                         index_params, args.embeddings_dtype, near_duplicates=near_duplicates)
+    print(f"Knowledge base created and saved successfully at '{kb_path}'.")
 
-# Load environment variables
-load_dotenv()
-openai_api_key = os.getenv('OPENAI_API_KEY')
-if not openai_api_key:
-    raise ValueError("Please set the OPENAI_API_KEY environment variable in a .env file or your environment.")
-
-# Load your dataset
-file_path = '/home/dreambig/Downloads/remote job/ai-medical-chatbot-master/8-Interviewer/dialogues_embededd.pkl'
-data = pd.read_pickle(file_path)
-texts = data['combined'].tolist()
-
-# Initialize embedding model
-embedding_model = OpenAIEmbeddings(model="text-embedding-ada-002", openai_api_key=openai_api_key)
-
-# Convert texts to Document objects
-print("Converting texts to Document objects...")
-documents = [Document(page_content=text) for text in texts]
-
-# Generate embeddings with progress bar
-print("Generating embeddings...")
-embeddings = []
-for doc in tqdm(documents, desc="Embedding texts", unit="docs"):
-    embeddings.append(embedding_model.embed_documents([doc.page_content])[0])
-
-embeddings = np.array(embeddings, dtype=np.float32)
-
-# Save embeddings before proceeding further
-os.makedirs('knowledge', exist_ok=True)
-np.save('knowledge/embeddings.npy', embeddings)
-print("Embeddings saved successfully at 'knowledge/embeddings.npy'.")
-
-# Create FAISS index
-print("Creating FAISS index...")
-dimension = embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(embeddings)
-
-# Prepare docstore and index mapping
-from langchain.docstore import InMemoryDocstore
-
-docstore = InMemoryDocstore({i: doc for i, doc in enumerate(documents)})
-index_to_docstore_id = {i: i for i in range(len(documents))}
-
-# Create FAISS vector store
-faiss_vectorstore = FAISS(
-    embedding_function=embedding_model,
-    index=index,
-    docstore=docstore,
-    index_to_docstore_id=index_to_docstore_id
-)
-
-# Save the index locally
-faiss_vectorstore.save_local("knowledge/faiss_index_all_documents")
-
-print("FAISS index created and saved successfully at 'knowledge/faiss_index_all_documents'.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# kb_format.py
+"""
+On-disk format of the knowledge base shared by the build (fiss.py) and the app.
+
+A knowledge base is one directory (knowledge/faiss_index_all_documents) holding:
+
+    manifest.json       format version, corpus version, embedding model, index parameters
+                        and the list of files below
+    documents.parquet   one row per document: id, vector_id, text and metadata columns,
+                        in small row groups so the app can read documents lazily
+    embeddings.npy      (N, d) embedding matrix in the same order, memory-mappable
+                        (float32, float16, or int8 with embeddings.scale.npy)
+    index.faiss         the ANN index over the embeddings, holding each document's vector
+                        under its vector_id so incremental updates add and remove vectors
+                        in place
+    bm25.npz            BM25 weights for keyword retrieval, with bm25_vocab.json
+    topics.json         specialty tagging patterns and partition sizes; the documents'
+                        specialties are in the "topics" column of documents.parquet
+
+Rows are sorted by vector_id, which only ever grows, so deleting documents does not
+renumber the others; a fresh build numbers them 0..N-1. Format 1 had no vector_id and
+index positions equal to rows.
+
+Nothing in it is pickled. A new version is written to a staging directory and swapped
+in when complete, so readers never see a half-written knowledge base.
+"""
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+KB_FORMAT_VERSION = 2
+
+MANIFEST = "manifest.json"
+DOCUMENTS = "documents.parquet"
+EMBEDDINGS = "embeddings.npy"
+INDEX = "index.faiss"
+TOPICS = "topics.json"
+
+# Small row groups keep the cost of fetching one document by position low
+DOCUMENTS_ROW_GROUP_SIZE = 256
+
+def write_documents(kb_path, ids, vector_ids, texts, metadata=None):
+    """Write documents in vector_id order, with optional metadata columns ({name: values})."""
+    columns = {"id": pa.array(ids, pa.string()), "vector_id": pa.array(vector_ids, pa.int64()),
+               "text": pa.array(texts, pa.string())}
+    for name, values in (metadata or {}).items():
+        columns[name] = pa.array(values)
+    temp_path = os.path.join(kb_path, f"{DOCUMENTS}.tmp")
+    pq.write_table(pa.table(columns), temp_path, row_group_size=DOCUMENTS_ROW_GROUP_SIZE, compression="zstd")
+    os.replace(temp_path, os.path.join(kb_path, DOCUMENTS))
+
+def read_documents(kb_path, columns=None):
+    """Read documents.parquet (or some of its columns) as a pyarrow Table."""
+    return pq.read_table(os.path.join(kb_path, DOCUMENTS), columns=columns, memory_map=True)
+
+def read_manifest(kb_path):
+    manifest_path = os.path.join(kb_path, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def write_manifest(kb_path, backend, documents, source, previous=None, added=None, deleted=0, index=None,
+                   embeddings_dtype="float32", near_duplicates=None):
+    """Record the format and corpus version, embedding model, index type and files of a knowledge base."""
+    manifest = {
+        "format_version": KB_FORMAT_VERSION,
+        "corpus_version": (previous or {}).get("corpus_version", 0) + 1,
+        "embedding_backend": backend.name,
+        "embedding_model": backend.model,
+        "dimension": backend.dimension,
+        "embeddings_dtype": embeddings_dtype,
+        "documents": documents,
+        "source": os.path.abspath(source),
+        "added": documents if added is None else added,
+        "deleted": deleted,
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "index": index or (previous or {}).get("index", {"type": "flat"}),
+        "near_duplicates": near_duplicates,
+        "files": {name: os.path.getsize(os.path.join(kb_path, name))
+                  for name in sorted(os.listdir(kb_path)) if name != MANIFEST},
+    }
+    with open(os.path.join(kb_path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+@contextmanager
+def staged_directory(kb_path):
+    """
+    Yield an empty staging directory that replaces kb_path once the block completes.
+
+    If the block fails, kb_path is left untouched.
+    """
+    stage, old = f"{kb_path}.staging", f"{kb_path}.old"
+    shutil.rmtree(stage, ignore_errors=True)
+    os.makedirs(stage)
+    yield stage
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(kb_path):
+        os.replace(kb_path, old)
+    os.replace(stage, kb_path)
+    shutil.rmtree(old, ignore_errors=True)
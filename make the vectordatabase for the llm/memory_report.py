@@ -0,0 +1,108 @@
+"""
+Report the resident memory a Gradio worker pays for the FAISS index.
+
+    python memory_report.py knowledge/faiss_index_all_documents/index.faiss --workers 4
+
+Loads the index in separate processes, once fully into RAM and once memory-mapped the
+way the app does (read_index_mapped: IO_FLAG_MMAP_IFC for Flat and HNSW, IO_FLAG_MMAP
+alone for IVF), and prints per-process resident memory split into private and shared
+pages. Memory-mapped pages live in the OS page cache, so several workers on one host
+share a single copy.
+"""
+import argparse
+import multiprocessing
+import queue
+import threading
+import faiss
+from ann_index import read_index_mapped
+
+def _memory_kb():
+    """Rss, Private and Shared memory of this process in kB, from /proc/self/smaps_rollup."""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(":") in ("Rss", "Private_Clean", "Private_Dirty", "Shared_Clean", "Shared_Dirty"):
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": values.get("Rss", 0),
+        "private": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+        "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+    }
+
+def _worker(index_path, mmap, ready, done, results):
+    reported = False
+    try:
+        before = _memory_kb()
+        index, mode = read_index_mapped(index_path) if mmap else (faiss.read_index(index_path), "in RAM")
+        # Run a few queries so the pages they read are resident, as in a serving worker
+        index.search(faiss.rand((16, index.d)), 4)
+        ready.wait()
+        after = _memory_kb()
+        results.put({"mode": mode, **{key: after[key] - before[key] for key in after}})
+        reported = True
+        done.wait()
+    except threading.BrokenBarrierError:
+        pass
+    except Exception as e:
+        # Report the failure and break the barriers so neither the parent nor the other workers wait forever
+        if not reported:
+            results.put({"error": f"{type(e).__name__}: {e}"})
+        ready.abort()
+        done.abort()
+
+def measure(index_path, mmap, workers, timeout=600):
+    """
+    Load the index in workers concurrent processes and return their memory samples.
+
+    Raises:
+        RuntimeError: When a worker fails or the workers do not finish within timeout seconds
+    """
+    ready = multiprocessing.Barrier(workers + 1)
+    done = multiprocessing.Barrier(workers + 1)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_worker, args=(index_path, mmap, ready, done, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = []
+    try:
+        ready.wait(timeout)
+        samples = [results.get(timeout=timeout) for _ in processes]
+        done.wait(timeout)
+    except (threading.BrokenBarrierError, queue.Empty):
+        ready.abort()
+        done.abort()
+        while not results.empty() or len(samples) < len(processes):
+            try:
+                samples.append(results.get(timeout=1))
+            except queue.Empty:
+                break
+    finally:
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+    errors = [sample["error"] for sample in samples if "error" in sample]
+    if errors or len(samples) < len(processes):
+        raise RuntimeError(f"Loading {index_path} failed: "
+                           f"{errors[0] if errors else f'workers did not finish within {timeout} s'}")
+    return samples
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare worker memory with and without a memory-mapped FAISS index.")
+    parser.add_argument("index", help="Path to index.faiss")
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent worker processes to simulate")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for the workers to load the index")
+    args = parser.parse_args(argv)
+
+    for mmap in (False, True):
+        samples = measure(args.index, mmap, args.workers, args.timeout)
+        rss = sum(sample["rss"] for sample in samples) / len(samples) / 1024
+        private = sum(sample["private"] for sample in samples) / len(samples) / 1024
+        shared = sum(sample["shared"] for sample in samples) / len(samples) / 1024
+        label = samples[0]["mode"]
+        print(f"{label:<8} per worker: resident {rss:8.1f} MB, private {private:8.1f} MB, shared {shared:8.1f} MB")
+
+if __name__ == "__main__":
+    main()
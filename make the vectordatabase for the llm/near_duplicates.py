@@ -0,0 +1,119 @@
+# near_duplicates.py
+"""
+Near-duplicate detection for the knowledge base build, by MinHash and LSH banding.
+
+Each text is reduced to the set of its word 3-shingles and summarized by a MinHash
+signature of NUM_PERM values; the share of equal values in two signatures estimates the
+Jaccard similarity of their shingle sets. Signatures are split into bands, and only texts
+sharing a band bucket are compared, so the cost grows linearly with the corpus.
+"""
+import csv
+import re
+import numpy as np
+from tqdm import tqdm
+
+NUM_PERM = 128
+DEFAULT_THRESHOLD = 0.9
+# Band layout is chosen so that a pair exactly at the threshold becomes a candidate with at least this probability
+MIN_CANDIDATE_PROBABILITY = 0.95
+
+_WORD = re.compile(r"\w+")
+_MAX_HASH = np.iinfo(np.uint32).max
+# Multipliers combining the token IDs of a shingle into one 64-bit value
+_SHINGLE_MIXERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+
+def _shingles(token_ids):
+    if len(token_ids) < len(_SHINGLE_MIXERS):
+        return np.unique(token_ids * _SHINGLE_MIXERS[0])
+    size = len(token_ids) - len(_SHINGLE_MIXERS) + 1
+    values = np.zeros(size, dtype=np.uint64)
+    for offset, mixer in enumerate(_SHINGLE_MIXERS):
+        values ^= token_ids[offset:offset + size] * mixer
+    return np.unique(values)
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=0):
+    """
+    Compute the MinHash signature of every text.
+
+    Returns:
+        np.ndarray: (len(texts), num_perm) uint32 signatures; rows of texts without words are all 0xFFFFFFFF
+    """
+    rng = np.random.default_rng(seed)
+    # Multiply-shift hashing: odd 64-bit multipliers, keep the high 32 bits
+    multipliers = (rng.integers(0, 2**63, num_perm, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+    increments = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+    vocabulary = {}
+    signatures = np.full((len(texts), num_perm), _MAX_HASH, dtype=np.uint32)
+    for row, text in enumerate(tqdm(texts, desc="MinHash signatures", unit="doc", mininterval=1)):
+        tokens = [vocabulary.setdefault(word, len(vocabulary) + 1) for word in _WORD.findall(text.lower())]
+        if not tokens:
+            continue
+        shingles = _shingles(np.array(tokens, dtype=np.uint64))
+        hashes = (multipliers[:, None] * shingles[None, :] + increments[:, None]) >> np.uint64(32)
+        signatures[row] = hashes.min(axis=1)
+    return signatures
+
+def lsh_parameters(num_perm, threshold):
+    """
+    Pick (bands, rows per band) for a similarity threshold.
+
+    Takes the layout with the most rows per band, which yields the fewest candidate pairs,
+    that still makes a pair at the threshold a candidate with MIN_CANDIDATE_PROBABILITY.
+    """
+    for rows in sorted((r for r in range(1, num_perm + 1) if num_perm % r == 0), reverse=True):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= MIN_CANDIDATE_PROBABILITY:
+            return bands, rows
+    return num_perm, 1
+
+def find_near_duplicates(texts, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM, seed=0):
+    """
+    Group texts whose estimated Jaccard similarity reaches threshold.
+
+    Texts sharing an LSH bucket are compared with the bucket's earliest text and grouped
+    with it when their signatures agree on at least threshold of the values. Every group
+    is represented by its earliest text.
+
+    Returns:
+        tuple: (representative row of every row, estimated similarity to it), both np.ndarray
+    """
+    signatures = minhash_signatures(texts, num_perm, seed)
+    bands, rows = lsh_parameters(num_perm, threshold)
+    parent = np.arange(len(texts))
+    similarity = np.ones(len(texts), dtype=np.float32)
+    has_words = signatures[:, 0] != _MAX_HASH
+
+    def root(row):
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return row
+
+    for band in range(bands):
+        buckets = {}
+        for row in np.flatnonzero(has_words):
+            buckets.setdefault(signatures[row, band * rows:(band + 1) * rows].tobytes(), []).append(row)
+        for members in buckets.values():
+            anchor = members[0]
+            for row in members[1:]:
+                estimate = float(np.mean(signatures[anchor] == signatures[row]))
+                if estimate < threshold:
+                    continue
+                first, second = root(anchor), root(row)
+                if first != second:
+                    # The earlier row stays the representative of the merged group
+                    first, second = min(first, second), max(first, second)
+                    parent[second] = first
+                    similarity[second] = min(similarity[second], estimate)
+    representatives = np.array([root(row) for row in range(len(texts))])
+    return representatives, similarity
+
+def write_report(report_path, ids, texts, representatives, similarity, preview=200):
+    """Write one CSV row per collapsed text: the text kept in its place, the estimated similarity and previews."""
+    with open(report_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["kept_id", "collapsed_id", "similarity", "kept_text", "collapsed_text"])
+        for row in np.flatnonzero(representatives != np.arange(len(representatives))):
+            kept = representatives[row]
+            writer.writerow([ids[kept], ids[row], f"{similarity[row]:.3f}",
+                             texts[kept][:preview], texts[row][:preview]])
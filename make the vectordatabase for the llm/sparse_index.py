@@ -0,0 +1,44 @@
+# sparse_index.py
+import json
+import os
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+
+# Tokenization shared with the app's SparseRetriever, which rebuilds the vectorizer from bm25_vocab.json
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+STOP_WORDS = "english"
+
+def build_sparse_index(texts, k1=1.2, b=0.75, min_df=2):
+    """
+    Precompute BM25 weights for a corpus.
+
+    Returns a (terms x documents) CSR matrix, so scoring a query is a sum over the rows of
+    its terms, and the vocabulary mapping each term to its row. Terms seen in fewer than
+    min_df documents are dropped, except on small corpora.
+    """
+    min_df = min_df if len(texts) >= 1000 else 1
+    vectorizer = CountVectorizer(token_pattern=TOKEN_PATTERN, stop_words=STOP_WORDS, min_df=min_df, dtype=np.float32)
+    counts = vectorizer.fit_transform(texts).tocsr()
+    num_documents = counts.shape[0]
+    document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log1p((num_documents - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+
+    lengths = np.asarray(counts.sum(axis=1)).ravel()
+    norms = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    tf = counts.data
+    row_norms = np.repeat(norms, np.diff(counts.indptr))
+    counts.data = (tf * (k1 + 1) / (tf + row_norms) * idf[counts.indices]).astype(np.float32)
+
+    vocabulary = {term: int(column) for term, column in vectorizer.vocabulary_.items()}
+    return counts.T.tocsr(), vocabulary
+
+def write_sparse_index(index_path, texts, **params):
+    """Write bm25.npz and bm25_vocab.json next to the FAISS index, rows in index order."""
+    weights, vocabulary = build_sparse_index(texts, **params)
+    temp_path = os.path.join(index_path, "bm25.tmp.npz")
+    sp.save_npz(temp_path, weights, compressed=False)
+    os.replace(temp_path, os.path.join(index_path, "bm25.npz"))
+    with open(os.path.join(index_path, "bm25_vocab.json"), "w") as f:
+        json.dump({"token_pattern": TOKEN_PATTERN, "stop_words": STOP_WORDS, "vocabulary": vocabulary}, f)
+    return weights
@@ -0,0 +1,85 @@
+# topics.py
+"""
+Specialty tagging of dialogues for partitioned retrieval.
+
+Every dialogue gets up to MAX_TOPICS specialties, the ones whose keywords occur most often
+in its Description (the patient's question title), or "general" when none occur. The
+tags are stored in the "topics" column of documents.parquet, and the patterns used are
+written to topics.json so the app detects the specialty of an interview with exactly
+the same rules. Keywords are English, so the app matches them against the English
+entries of the interview history. Abbreviations and everyday words that often mean
+something else ("bp", "gas", "son", "daughter", "ear") are left out.
+"""
+import json
+import os
+import re
+from collections import Counter
+from kb_format import TOPICS
+
+GENERAL = "general"
+MAX_TOPICS = 2
+
+TOPIC_KEYWORDS = {
+    "cardiology": ["heart", "cardiac", "chest pain", "palpitation", "blood pressure", "hypertension",
+                   "cholesterol", "angina", "arrhythmia", "ecg", "ekg", "heart attack", "pulse"],
+    "respiratory": ["cough", "asthma", "breathing", "breathless", "lung", "wheezing", "bronchitis", "pneumonia",
+                    "phlegm", "sputum", "tuberculosis", "tb", "inhaler", "shortness of breath"],
+    "gastroenterology": ["stomach", "abdominal", "abdomen", "acidity", "gastritis", "constipation", "diarrhea",
+                         "diarrhoea", "vomiting", "nausea", "liver", "bowel", "ulcer", "heartburn", "gallbladder",
+                         "bloating", "flatulence", "indigestion", "hemorrhoid", "piles", "jaundice"],
+    "neurology": ["headache", "migraine", "seizure", "epilepsy", "dizziness", "dizzy", "numbness", "tingling",
+                  "stroke", "nerve", "vertigo", "brain", "paralysis", "tremor"],
+    "orthopedics": ["back pain", "knee", "joint", "shoulder", "fracture", "bone", "spine", "neck pain", "ankle",
+                    "wrist", "hip", "arthritis", "ligament", "sprain", "disc", "muscle"],
+    "dermatology": ["skin", "rash", "acne", "pimple", "itching", "itchy", "eczema", "psoriasis", "hair loss",
+                    "dandruff", "pigmentation", "mole", "wart", "fungal", "hives"],
+    "endocrinology": ["diabetes", "diabetic", "sugar", "thyroid", "insulin", "hormone", "hormonal", "tsh",
+                      "hypothyroidism", "hyperthyroidism", "pcos", "obesity", "weight gain"],
+    "gynecology": ["pregnant", "pregnancy", "periods", "missed period", "menstrual", "menstruation", "ovulation",
+                   "uterus", "ovary", "ovarian", "vaginal", "miscarriage", "conceive", "fertility", "ivf", "breast",
+                   "delivery"],
+    "urology": ["urine", "urinary", "kidney", "bladder", "prostate", "testicle", "testicular", "penis",
+                "erectile", "uti", "kidney stone", "sperm", "scrotum"],
+    "ent": ["earache", "ear pain", "ear infection", "nose", "throat", "tonsil", "sinus", "sinusitis", "hearing", "tinnitus", "nasal", "voice"],
+    "ophthalmology": ["eye", "vision", "eyesight", "blurred", "cataract", "glaucoma", "retina", "conjunctivitis"],
+    "psychiatry": ["anxiety", "depression", "depressed", "stress", "panic", "insomnia", "sleep", "mental",
+                   "suicidal", "mood", "ocd", "bipolar", "schizophrenia"],
+    "dentistry": ["tooth", "teeth", "dental", "gum", "cavity", "wisdom tooth", "root canal", "jaw"],
+    "pediatrics": ["baby", "infant", "child", "toddler", "newborn", "vaccination", "vaccine"],
+    "infectious": ["fever", "infection", "viral", "bacterial", "dengue", "malaria", "typhoid", "hiv", "std",
+                   "herpes", "antibiotic", "flu"],
+}
+
+def topic_patterns(keywords=TOPIC_KEYWORDS):
+    """One regular expression per topic matching any of its keywords (and simple plurals) as whole words."""
+    patterns = {}
+    for topic, words in keywords.items():
+        alternatives = "|".join(re.escape(word).replace(r"\ ", r"\s+") for word in sorted(words, key=len, reverse=True))
+        patterns[topic] = rf"\b(?:{alternatives})(?:s|es)?\b"
+    return patterns
+
+def tag_topics(texts, max_topics=MAX_TOPICS, patterns=None):
+    """
+    Tag each text with its most frequently matched topics.
+
+    Returns:
+        list: One list of up to max_topics topics per text, [GENERAL] when nothing matches
+    """
+    compiled = {topic: re.compile(pattern, re.IGNORECASE) for topic, pattern in (patterns or topic_patterns()).items()}
+    tags = []
+    for text in texts:
+        hits = Counter({topic: len(pattern.findall(text or "")) for topic, pattern in compiled.items()})
+        tags.append([topic for topic, count in hits.most_common(max_topics) if count > 0] or [GENERAL])
+    return tags
+
+def write_topics(kb_path, tags, max_topics=MAX_TOPICS, patterns=None):
+    """Write topics.json: the tagging patterns and the number of documents per topic."""
+    config = {
+        "max_topics": max_topics,
+        "general": GENERAL,
+        "patterns": patterns or topic_patterns(),
+        "documents": dict(Counter(topic for topics in tags for topic in topics).most_common()),
+    }
+    with open(os.path.join(kb_path, TOPICS), "w") as f:
+        json.dump(config, f, indent=2)
+    return config
@@ -0,0 +1,7 @@
+# conftest.py
+import os
+import sys
+
+# The app (hf/) and the build folder are flat module directories run from their own folders
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "hf"), os.path.join(ROOT, "make the vectordatabase for the llm")]
@@ -0,0 +1,31 @@
+# test_dialogue_ingest.py
+import pyarrow.parquet as pq
+from dialogue_ingest import ingest_shard
+
+SHARD = """id=1
+https://www.example.com/question/1
+Description
+Q. Why does my knee hurt?
+Dialogue
+Patient:
+Hi doctor, my knee hurts
+when I climb stairs.
+Doctor:
+Hi. Rest it for a week.
+id=2
+Description
+Q. Incomplete dialogue
+Patient:
+Hello?
+"""
+
+def test_shards_are_written_in_the_knowledge_base_layout(tmp_path):
+    shard = tmp_path / "dialogue_2020.txt"
+    shard.write_text(SHARD, encoding="utf-8")
+    _, written, skipped = ingest_shard(str(shard), str(tmp_path))
+    assert (written, skipped) == (1, 1)
+    table = pq.read_table(tmp_path / "part-dialogue_2020.parquet")
+    assert table.column_names == ["source", "dialogue_id", "Question", "Patient", "Answer", "combined"]
+    assert table.column("combined").to_pylist() == [
+        "Question: Q. Why does my knee hurt?; Patient: Hi doctor, my knee hurts when I climb stairs.; "
+        "Answer: Hi. Rest it for a week."]
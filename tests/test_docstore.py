@@ -0,0 +1,35 @@
+# test_docstore.py
+import pytest
+from langchain_core.documents import Document
+from docstore import ParquetDocstore, PositionMapping, VectorIdMapping
+from kb_format import write_documents
+
+def test_vector_ids_map_to_rows_across_gaps():
+    mapping = VectorIdMapping([0, 1, 5, 9])
+    assert [mapping[vector_id] for vector_id in (0, 1, 5, 9)] == [0, 1, 2, 3]
+    for missing in (2, 8, 10, -1):
+        with pytest.raises(KeyError):
+            mapping[missing]
+    assert list(mapping) == [0, 1, 5, 9] and len(mapping) == 4
+    assert mapping.vector_ids([2, 3]).tolist() == [5, 9]
+
+def test_positions_map_to_themselves():
+    mapping = PositionMapping(3)
+    assert mapping[2] == 2 and list(mapping) == [0, 1, 2]
+    with pytest.raises(KeyError):
+        mapping[3]
+
+def test_docstore_reads_rows_lazily_with_their_metadata(tmp_path):
+    count = 600  # Several row groups
+    write_documents(str(tmp_path), [f"id{i}" for i in range(count)], [2 * i for i in range(count)],
+                    [f"text {i}" for i in range(count)], {"Question": [f"question {i}" for i in range(count)]})
+    docstore = ParquetDocstore(str(tmp_path / "documents.parquet"), cache_size=2)
+    mapping = docstore.index_mapping()
+    assert isinstance(mapping, VectorIdMapping) and mapping[1000] == 500
+    document = docstore.search(mapping[1000])
+    assert isinstance(document, Document) and document.page_content == "text 500"
+    assert document.metadata == {"id": "id500", "vector_id": 1000, "Question": "question 500", "position": 500}
+    assert docstore.search(count) == f"ID {count} not found." and docstore.search(True) == "ID True not found."
+    for row in (0, 300, 599):
+        docstore.search(row)
+    assert len(docstore._cache) == 2
@@ -0,0 +1,34 @@
+# test_embedding_cache.py
+from langchain_core.embeddings import Embeddings
+from embedding_cache import CachedEmbeddings
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+def test_queries_are_cached_by_normalized_text(tmp_path):
+    path = str(tmp_path / "cache" / "queries.sqlite3")
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, model_name="test", store_path=path)
+    assert cache.embed_query("chest  pain") == cache.embed_query("chest pain")
+    assert model.calls == 1
+    restarted = CachedEmbeddings(model, model_name="test", store_path=path)
+    assert restarted.embed_query("chest pain") == [11.0, 1.0]  # Stored under the first spelling
+    assert model.calls == 1 and restarted.stats()["store_hits"] == 1
+
+def test_unwritable_path_keeps_the_memory_tier(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, model_name="test", store_path=str(blocker / "queries.sqlite3"))
+    cache.embed_query("chest pain")
+    cache.embed_query("chest pain")
+    assert cache.store_path is None
+    assert model.calls == 1 and cache.stats()["memory_hits"] == 1
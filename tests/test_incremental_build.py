@@ -0,0 +1,76 @@
+# test_incremental_build.py
+import random
+import faiss
+import numpy as np
+import pandas as pd
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+import fiss
+from docstore import ParquetDocstore
+from embedding_backends import HashBackend
+from kb_format import read_documents, read_manifest
+from sparse_retriever import SparseIndex, SparseRetriever
+
+WORDS = "heart cough skin tooth fever knee eye sleep stomach urine baby back pain rash sugar".split()
+
+class HashEmbeddings(Embeddings):
+    """The build's offline hash backend as query embeddings."""
+
+    def __init__(self):
+        self.backend = HashBackend()
+
+    def embed_documents(self, texts):
+        return self.backend.embed(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def _dialogues(count, batch):
+    rng = random.Random(batch)
+    return [f"Question: {' '.join(rng.choice(WORDS) for _ in range(30))}; Answer: marker{batch}x{i}" for i in range(count)]
+
+def _build(output_dir, input_path, *extra):
+    fiss.main([str(input_path), "--output-dir", str(output_dir), "--backend", "hash", "--dedup-threshold", "0",
+               "--batch-size", "32", *extra])
+
+@pytest.fixture(scope="module")
+def updated_kb(tmp_path_factory):
+    """A knowledge base built from 120 dialogues, then updated to delete 30 from the middle and add 20."""
+    tmp_path = tmp_path_factory.mktemp("kb")
+    base, added = _dialogues(120, 1), _dialogues(20, 2)
+    pd.DataFrame({"combined": base}).to_parquet(tmp_path / "base.parquet")
+    pd.DataFrame({"combined": base[:40] + base[70:] + added}).to_parquet(tmp_path / "update.parquet")
+    _build(tmp_path, tmp_path / "base.parquet")
+    _build(tmp_path, tmp_path / "update.parquet", "--incremental", "--delete-missing")
+    return tmp_path / "faiss_index_all_documents", base[:40] + base[70:] + added
+
+def _vector_store(kb_path):
+    docstore = ParquetDocstore(str(kb_path / "documents.parquet"))
+    index = faiss.read_index(str(kb_path / "index.faiss"))
+    return FAISS(HashEmbeddings(), index, docstore, docstore.index_mapping())
+
+def test_update_removes_and_adds_vectors_in_place(updated_kb):
+    kb_path, texts = updated_kb
+    manifest = read_manifest(str(kb_path))
+    assert (manifest["documents"], manifest["added"], manifest["deleted"]) == (110, 20, 30)
+    assert manifest["index"]["changed_since_training"] == 50
+    documents = read_documents(str(kb_path), columns=["text", "vector_id"])
+    assert documents.column("text").to_pylist() == texts
+    vector_ids = documents.column("vector_id").to_numpy()
+    assert np.all(np.diff(vector_ids) > 0) and vector_ids[-1] == 139
+
+def test_dense_search_maps_vector_ids_to_rows(updated_kb):
+    kb_path, texts = updated_kb
+    vector_store = _vector_store(kb_path)
+    for row in (0, 39, 40, 89, 109):
+        documents = vector_store.similarity_search(texts[row], k=1)
+        assert documents[0].page_content == texts[row]
+        assert documents[0].metadata["position"] == row
+
+def test_bm25_returns_documents_by_row_after_deletes(updated_kb):
+    kb_path, texts = updated_kb
+    retriever = SparseRetriever(sparse_index=SparseIndex(str(kb_path)), vector_store=_vector_store(kb_path), k=1)
+    for row, text in enumerate(texts):
+        marker = text.rsplit("Answer: ", 1)[1]
+        assert [document.page_content for document in retriever.invoke(marker)] == [text]
@@ -0,0 +1,36 @@
+# test_index_storage.py
+import faiss
+import numpy as np
+import pytest
+from ann_index import create_index
+from embedding_storage import save_embeddings
+from index_storage import base_index, load_embeddings, read_index_mapped
+from mmr_retriever import DocumentVectors
+
+@pytest.fixture(scope="module")
+def vectors():
+    return np.random.default_rng(0).standard_normal((400, 16)).astype(np.float32)
+
+@pytest.mark.parametrize("dtype, tolerance", [("float32", 0), ("float16", 1e-2), ("int8", 5e-2)])
+def test_stored_embeddings_read_back_as_float32(tmp_path, vectors, dtype, tolerance):
+    path = str(tmp_path / "embeddings.npy")
+    save_embeddings(path, vectors, dtype)
+    stored = load_embeddings(path)
+    assert stored.shape == vectors.shape
+    np.testing.assert_allclose(np.asarray(stored[:], dtype=np.float32), vectors, atol=tolerance)
+    # The app's MMR reads the same file by index position
+    positions = [5, 0, 399]
+    np.testing.assert_array_equal(DocumentVectors(str(tmp_path))[positions], np.asarray(stored[np.array(positions)], dtype=np.float32))
+
+@pytest.mark.parametrize("index_type, mode", [("flat", "mmap+ifc"), ("hnsw", "mmap+ifc"), ("ivf", "mmap")])
+def test_indexes_load_memory_mapped(tmp_path, vectors, index_type, mode):
+    if mode == "mmap+ifc" and not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        mode = "mmap"
+    ids = np.arange(100, 100 + len(vectors), dtype=np.int64)
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(create_index(vectors, index_type, ids=ids), path)
+    index, load_mode = read_index_mapped(path)
+    assert load_mode == mode and index.ntotal == len(vectors)
+    assert ("HNSW" in type(base_index(index)).__name__) == (index_type == "hnsw")
+    _, labels = index.search(vectors[:1], 1)
+    assert labels[0, 0] == 100
@@ -0,0 +1,42 @@
+# test_kb_format.py
+import os
+import pyarrow.parquet as pq
+import pytest
+from embedding_backends import HashBackend
+from kb_format import (DOCUMENTS, DOCUMENTS_ROW_GROUP_SIZE, KB_FORMAT_VERSION, MANIFEST, read_documents,
+                       read_manifest, staged_directory, write_documents, write_manifest)
+
+def _write(kb_path, count, previous=None):
+    with staged_directory(kb_path) as stage:
+        write_documents(stage, [f"id{i}" for i in range(count)], list(range(count)), [f"text {i}" for i in range(count)],
+                        {"Question": [f"question {i}" for i in range(count)]})
+        return write_manifest(stage, HashBackend(dimension=8), count, "input.parquet", previous)
+
+def test_manifest_versions_and_lists_the_files(tmp_path):
+    kb_path = str(tmp_path / "kb")
+    first = _write(kb_path, 600)
+    assert (first["format_version"], first["corpus_version"]) == (KB_FORMAT_VERSION, 1)
+    assert (first["embedding_backend"], first["dimension"], first["documents"]) == ("hash", 8, 600)
+    assert list(first["files"]) == [DOCUMENTS]
+    second = _write(kb_path, 10, read_manifest(kb_path))
+    assert second["corpus_version"] == 2 and read_manifest(kb_path) == second
+
+def test_documents_are_written_in_small_row_groups(tmp_path):
+    kb_path = str(tmp_path / "kb")
+    _write(kb_path, 600)
+    documents = read_documents(kb_path, columns=["id", "vector_id", "Question"])
+    assert documents.column_names == ["id", "vector_id", "Question"]
+    assert documents.column("vector_id").to_pylist() == list(range(600))
+    metadata = pq.ParquetFile(os.path.join(kb_path, DOCUMENTS)).metadata
+    assert metadata.num_row_groups == 3
+    assert all(metadata.row_group(group).num_rows <= DOCUMENTS_ROW_GROUP_SIZE for group in range(3))
+
+def test_failed_writes_leave_the_knowledge_base_untouched(tmp_path):
+    kb_path = str(tmp_path / "kb")
+    _write(kb_path, 3)
+    with pytest.raises(RuntimeError):
+        with staged_directory(kb_path) as stage:
+            write_documents(stage, ["new"], [0], ["replacement"])
+            raise RuntimeError("build failed")
+    assert read_documents(kb_path, columns=["text"]).column("text").to_pylist() == ["text 0", "text 1", "text 2"]
+    assert sorted(os.listdir(kb_path)) == [DOCUMENTS, MANIFEST]
@@ -0,0 +1,35 @@
+# test_near_duplicates.py
+import csv
+import random
+import numpy as np
+from near_duplicates import MIN_CANDIDATE_PROBABILITY, find_near_duplicates, lsh_parameters, minhash_signatures, write_report
+
+def _dialogue(seed, words=80):
+    rng = random.Random(seed)
+    return " ".join(f"w{rng.randrange(500)}" for _ in range(words))
+
+def test_band_layout_catches_pairs_at_the_threshold():
+    bands, rows = lsh_parameters(128, 0.9)
+    assert bands * rows == 128
+    assert 1 - (1 - 0.9 ** rows) ** bands >= MIN_CANDIDATE_PROBABILITY
+
+def test_signatures_estimate_jaccard_similarity():
+    base = _dialogue(0).split()
+    texts = [" ".join(base), " ".join(base[:40] + _dialogue(1, 40).split()), ""]
+    signatures = minhash_signatures(texts, num_perm=256)
+    assert np.mean(signatures[0] == signatures[0]) == 1.0
+    assert 0.1 < np.mean(signatures[0] == signatures[1]) < 0.6  # 38 of 118 shingles shared
+    assert (signatures[2] == np.iinfo(np.uint32).max).all()
+
+def test_near_copies_collapse_into_the_earliest_text(tmp_path):
+    original = _dialogue(0)
+    near_copy = original + " thanks"
+    texts = [_dialogue(1), original, _dialogue(2), near_copy, "", ""]
+    representatives, similarity = find_near_duplicates(texts, threshold=0.9)
+    assert representatives.tolist() == [0, 1, 2, 1, 4, 5]  # Texts without words are never grouped
+    assert 0.9 <= similarity[3] < 1.0
+    report = tmp_path / "near_duplicates.csv"
+    write_report(str(report), [f"id{i}" for i in range(len(texts))], texts, representatives, similarity)
+    with open(report, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["kept_id"], row["collapsed_id"]) for row in rows] == [("id1", "id3")]
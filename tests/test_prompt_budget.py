@@ -0,0 +1,33 @@
+# test_prompt_budget.py
+import pytest
+from langchain_core.documents import Document
+import prompt_budget
+from prompt_budget import TRUNCATION_MARKER, count_tokens, fit_documents, fit_history, truncate_tokens
+
+@pytest.fixture(autouse=True)
+def character_tokens(monkeypatch):
+    """Count tokens as characters/4, without loading the chat model's encoding."""
+    monkeypatch.setattr(prompt_budget, "_encoding", False)
+
+def test_truncation_keeps_the_head_or_tail_within_budget():
+    text = "".join(f"{i:04d}" for i in range(100))
+    head, tail = truncate_tokens(text, 20), truncate_tokens(text, 20, keep="tail")
+    assert head.startswith("0000") and head.endswith(TRUNCATION_MARKER)
+    assert tail.startswith(TRUNCATION_MARKER) and tail.endswith("0099")
+    assert count_tokens(head) <= 20 and count_tokens(tail) <= 20
+    assert truncate_tokens(text, 100) == text
+
+def test_history_keeps_recent_lines_under_one_marker():
+    history = "\n".join(f"Q{i}: {'word ' * 10}" for i in range(20))
+    fitted = fit_history(history, 60)
+    assert fitted.startswith(f"{TRUNCATION_MARKER}\n") and fitted.endswith(history.split("\n")[-1])
+    assert count_tokens(fitted) <= 60
+    long_line = fit_history("Q1: " + "x" * 1000, 40)
+    assert long_line.count(TRUNCATION_MARKER) == 1 and count_tokens(long_line) <= 40
+
+def test_documents_are_deduplicated_and_fitted_in_rank_order():
+    texts = ["alpha beta gamma delta " * 20, "alpha beta gamma delta " * 20, "epsilon zeta eta theta " * 60]
+    fitted = fit_documents([Document(page_content=text) for text in texts], budget=200)
+    assert [document.page_content[:5] for document in fitted] == ["alpha", "epsil"]
+    assert fitted[1].page_content.endswith(TRUNCATION_MARKER)
+    assert sum(count_tokens(document.page_content) for document in fitted) <= 200
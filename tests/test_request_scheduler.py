@@ -0,0 +1,89 @@
+# test_request_scheduler.py
+import asyncio
+import threading
+import httpx
+import pytest
+from request_scheduler import FairSemaphore, RequestScheduler, TokenBucket
+
+def test_freed_slots_go_to_sessions_in_turn():
+    async def scenario():
+        semaphore = FairSemaphore(1)
+        await semaphore.aacquire("holder")
+        granted = []
+
+        async def request(session, name):
+            await semaphore.aacquire(session)
+            granted.append(name)
+
+        tasks = []
+        for session, name in [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")]:
+            tasks.append(asyncio.create_task(request(session, name)))
+            await asyncio.sleep(0)
+        assert semaphore.stats()["queued"] == 4 and semaphore.stats()["sessions_waiting"] == 2
+        for _ in tasks:
+            semaphore.release()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+        return granted, semaphore.stats()
+
+    granted, stats = asyncio.run(scenario())
+    # Session a queued three requests first, but b is served after a's first one
+    assert granted == ["a1", "b1", "a2", "a3"]
+    assert (stats["in_flight"], stats["queued"], stats["peak_queued"]) == (1, 0, 4)
+
+def test_cancelled_waiters_leave_the_queue():
+    async def scenario():
+        semaphore = FairSemaphore(1)
+        await semaphore.aacquire()
+        waiter = asyncio.create_task(semaphore.aacquire("a"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        semaphore.release()
+        return semaphore.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["in_flight"], stats["queued"], stats["sessions_waiting"]) == (0, 0, 0)
+
+def test_threads_and_coroutines_share_the_slots():
+    semaphore = FairSemaphore(1)
+    semaphore.acquire("a")
+    acquired = threading.Event()
+
+    def worker():
+        semaphore.acquire("b")
+        acquired.set()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert not acquired.wait(0.05)
+    semaphore.release()
+    assert acquired.wait(1)
+    thread.join()
+    assert semaphore.stats()["in_flight"] == 1
+
+def test_token_bucket_throttles_past_its_burst():
+    bucket = TokenBucket(per_minute=60)  # One unit per second, bursts of ten
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve(2) == pytest.approx(3.0, abs=0.05)
+
+def test_scheduler_counts_rate_limit_waits():
+    scheduler = RequestScheduler(max_concurrent=2, model_limits={"m": {"rpm": 6, "concurrency": 1}})
+    assert scheduler.quota_delay("m", 100) == 0.0  # A burst of one request
+    assert scheduler.quota_delay("m", 100) == pytest.approx(10.0, abs=0.1)
+    assert scheduler.stats()["rate_limited"] == 1
+    release = scheduler.acquire("m", "a")
+    assert scheduler.stats()["models"]["m"]["in_flight"] == 1
+    release()
+    release()  # Releasing twice frees the slots once
+    assert scheduler.stats()["global"]["in_flight"] == 0
+
+def test_retries_honour_retry_after_and_give_up():
+    scheduler = RequestScheduler(model_limits={})
+    delay = scheduler.retry_delay(0, httpx.Response(429, headers={"retry-after": "2"}))
+    assert 2.0 <= delay <= 2.5
+    assert scheduler.retry_delay(0, httpx.Response(400)) is None
+    assert scheduler.retry_delay(100, httpx.Response(503)) is None
+    assert scheduler.stats()["throttled"] == 1 and scheduler.stats()["server_errors"] == 1
@@ -0,0 +1,43 @@
+# test_resumable_embedding.py
+import os
+import numpy as np
+import pytest
+from embedding_backends import HashBackend
+from fiss import embed_texts
+
+class FlakyBackend(HashBackend):
+    """Hash embeddings that fail, without retry, on one call."""
+
+    def __init__(self, fail_on=None):
+        super().__init__(dimension=16)
+        self.calls = 0
+        self.fail_on = fail_on
+
+    def embed(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise ConnectionError("connection dropped")
+        return super().embed(texts)
+
+TEXTS = [f"dialogue {i} about symptom {i % 7}" for i in range(50)]
+
+def test_interrupted_runs_resume_from_the_checkpoint(tmp_path):
+    path = str(tmp_path / "embeddings.npy")
+    with pytest.raises(ConnectionError):
+        embed_texts(TEXTS, FlakyBackend(fail_on=3), path, batch_size=10, workers=1)
+    assert os.path.exists(f"{path}.progress.json")
+    backend = FlakyBackend()
+    embeddings = embed_texts(TEXTS, backend, path, batch_size=10, workers=1)
+    assert backend.calls < 5  # Only the batches not checkpointed are embedded again
+    np.testing.assert_allclose(embeddings, HashBackend(dimension=16).embed(TEXTS))
+    assert not os.path.exists(f"{path}.progress.json")
+
+def test_checkpoints_of_other_inputs_are_not_resumed(tmp_path):
+    path = str(tmp_path / "embeddings.npy")
+    with pytest.raises(ConnectionError):
+        embed_texts(TEXTS, FlakyBackend(fail_on=3), path, batch_size=10, workers=1)
+    reordered = TEXTS[::-1]
+    backend = FlakyBackend()
+    embeddings = embed_texts(reordered, backend, path, batch_size=10, workers=1)
+    assert backend.calls == 5
+    np.testing.assert_allclose(embeddings, HashBackend(dimension=16).embed(reordered))
@@ -0,0 +1,35 @@
+# test_session_audio.py
+import time
+from audio_store import SessionAudioStore
+from session import SessionStore
+
+def test_clips_are_taken_once_and_expire():
+    store = SessionAudioStore(ttl_seconds=60)
+    store.put("conclusion", b"mp3")
+    assert store.nbytes == 3
+    assert store.take("conclusion") == b"mp3"
+    assert store.take("conclusion") is None
+    store.ttl_seconds = 0
+    store.put("conclusion", b"mp3")
+    time.sleep(0.01)
+    assert store.take("conclusion") is None and store.nbytes == 0
+
+def test_oldest_clips_are_dropped_past_the_byte_limit():
+    store = SessionAudioStore(max_bytes=10)
+    store.put("first", b"x" * 6)
+    store.put("second", b"y" * 6)
+    assert store.take("first") is None and store.take("second") == b"y" * 6
+
+def test_session_store_accounts_and_releases_audio():
+    sessions = SessionStore(max_sessions=1, ttl_seconds=60)
+    session = sessions.get("a")
+    before = session.memory_usage()
+    session.audio.put("conclusion", b"x" * 1000)
+    assert session.memory_usage() == before + 1000
+    assert sessions.stats()["audio_bytes"] == 1000
+    sessions.get("b")  # Evicts "a", the least recently used session
+    assert session.audio.nbytes == 0
+    other = sessions.get("b")
+    other.audio.put("conclusion", b"x")
+    sessions.remove("b")
+    assert other.audio.nbytes == 0
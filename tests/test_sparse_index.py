@@ -0,0 +1,28 @@
+# test_sparse_index.py
+import numpy as np
+from sparse_index import build_sparse_index, write_sparse_index
+from sparse_retriever import SparseIndex
+
+TEXTS = [
+    "Chest pain when climbing stairs",
+    "Dry cough",
+    "Cough with chest congestion, fever and a sore throat",
+    "Itchy rash on both arms",
+]
+
+def test_weights_favour_rare_terms_and_short_documents():
+    weights, vocabulary = build_sparse_index(TEXTS)
+    assert weights.shape == (len(vocabulary), len(TEXTS))
+    assert "the" not in vocabulary and "and" not in vocabulary  # English stop words
+    cough, rash = weights[vocabulary["cough"]].toarray().ravel(), weights[vocabulary["rash"]].toarray().ravel()
+    assert cough[1] > cough[2] > 0  # Document 1 is shorter
+    assert rash[3] > cough[2]  # rash occurs in fewer documents
+    assert np.count_nonzero(cough) == 2
+
+def test_app_index_scores_queries_like_the_build(tmp_path):
+    write_sparse_index(str(tmp_path), TEXTS)
+    index = SparseIndex(str(tmp_path))
+    assert SparseIndex.exists(str(tmp_path)) and index.num_documents == len(TEXTS)
+    assert [position for position, _ in index.search("chest cough", k=4)] == [2, 1, 0]
+    assert [position for position, _ in index.search("chest cough", k=4, positions=np.array([0, 1]))] == [1, 0]
+    assert index.search("unrelated words", k=4) == []
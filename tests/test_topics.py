@@ -0,0 +1,23 @@
+# test_topics.py
+import pandas as pd
+import fiss
+from topic_partitions import TopicPartitions
+from topics import GENERAL, tag_topics
+
+def test_tags_count_whole_word_matches():
+    assert tag_topics(["Chest pain and palpitations, also a cough", "Nothing specific"]) == [
+        ["cardiology", "respiratory"], [GENERAL]]
+
+def test_build_tags_from_the_question_title(tmp_path):
+    # The answers talk about coughs; the titles say what the dialogues are about
+    questions = ["Heart palpitations at night", "Itchy skin rash", "Feeling tired"]
+    texts = [f"Question: {question}; Answer: cough cough cough" for question in questions]
+    pd.DataFrame({"combined": texts, "Question": questions}).to_parquet(tmp_path / "input.parquet")
+    fiss.main([str(tmp_path / "input.parquet"), "--output-dir", str(tmp_path), "--backend", "hash",
+               "--dedup-threshold", "0"])
+    partitions = TopicPartitions(str(tmp_path / "faiss_index_all_documents"))
+    assert partitions.positions(["cardiology"]).tolist() == [0]
+    assert partitions.positions(["dermatology"]).tolist() == [1]
+    assert partitions.positions([GENERAL]).tolist() == [2]
+    assert partitions.positions(["respiratory"]).size == 0
+    assert partitions.detect("My heart races and my pulse is fast") == ("cardiology",)
@@ -0,0 +1,17 @@
+# test_translation_cache.py
+from translation_cache import TranslationCache
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache" / "translations.sqlite3")
+    TranslationCache(path).put("Hello", "english", "german", "Hallo")
+    cache = TranslationCache(path)
+    assert cache.get("Hello", "english", "german") == "Hallo"
+    assert cache.get("Hello", "english", "french") is None
+
+def test_unwritable_path_keeps_the_memory_tier(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    cache = TranslationCache(str(blocker / "translations.sqlite3"))  # Its directory cannot be created
+    cache.put("Hello", "english", "german", "Hallo")
+    assert cache.path is None
+    assert cache.get("Hello", "english", "german") == "Hallo"